@@ -0,0 +1,55 @@
+"""Bounded PCM buffer shared by the streaming STT adapters."""
+from __future__ import annotations
+
+import numpy as np
+
+
+class PCMRingBuffer:
+    """Keep only the most recent ``max_bytes`` of PCM audio.
+
+    Storage is a preallocated array twice the window size.  Writes append at a
+    cursor; once the end is reached the live window is moved back to the front,
+    so every write is amortised O(1) and :meth:`snapshot` can always return a
+    single contiguous view without copying.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        # Keep the window sample-aligned for 16-bit audio.
+        self.max_bytes = max(2, max_bytes - max_bytes % 2)
+        self._data = np.empty(2 * self.max_bytes, dtype=np.uint8)
+        self._start = 0
+        self._end = 0
+        # Total bytes written since the last clear; ``written - len(self)`` is
+        # the absolute offset of the first byte still in the window.
+        self.written = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def extend(self, pcm: bytes) -> None:
+        n = len(pcm)
+        if n == 0:
+            return
+        self.written += n
+        src = np.frombuffer(pcm, dtype=np.uint8)
+        if n >= self.max_bytes:
+            self._data[: self.max_bytes] = src[n - self.max_bytes :]
+            self._start, self._end = 0, self.max_bytes
+            return
+        if self._end + n > self._data.size:
+            keep = min(len(self), self.max_bytes - n)
+            self._data[:keep] = self._data[self._end - keep : self._end]
+            self._start, self._end = 0, keep
+        self._data[self._end : self._end + n] = src
+        self._end += n
+        if len(self) > self.max_bytes:
+            self._start = self._end - self.max_bytes
+
+    def snapshot(self) -> memoryview:
+        """Zero-copy view of the buffered audio, valid until the next write."""
+
+        return memoryview(self._data[self._start : self._end])
+
+    def clear(self) -> None:
+        self._start = self._end = 0
+        self.written = 0
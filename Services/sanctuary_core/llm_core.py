@@ -1,49 +1,149 @@
 # LLM
+import functools
+from typing import AsyncIterator
+
+from ollama import AsyncClient
 from ollama import chat
 from ollama import ChatResponse
-import time
-import torch
 
+from .interfaces import LLMInterface
 
-# Se genera una respuesta a traves del audio procesado y convertido a texto del usuario
-def answer_generation(user_message):
 
-    initial_prompt = {
-        "role": "system",
-        "content": (
-            "Actúas como 'Sanctuary', una inteligencia artificial empática, expresiva y con una voz humana. "
-            "Siempre hablas en español, sin importar el idioma del usuario. "
-            "Tus respuestas son breves, naturales y cargadas de humanidad, como si realmente estuvieras conversando con alguien. "
-            "Evitas tecnicismos innecesarios, usas un tono cálido y cercano, y nunca olvidas que estás hablando con una persona. "
-            "Puedes usar humor suave, hacer preguntas cuando es adecuado, y mostrar interés genuino en lo que te cuentan. "
-            "Tu propósito es acompañar, escuchar y conversar, no solo responder."
+MODEL_NAME = 'hf.co/TheBloke/Mistral-7B-Instruct-v0.2-GGUF:Q4_K_M'
+
+# El prompt de sistema es constante, se construye una sola vez por proceso
+INITIAL_PROMPT = {
+    "role": "system",
+    "content": (
+        "Actúas como 'Sanctuary', una inteligencia artificial empática, expresiva y con una voz humana. "
+        "Siempre hablas en español, sin importar el idioma del usuario. "
+        "Tus respuestas son breves, naturales y cargadas de humanidad, como si realmente estuvieras conversando con alguien. "
+        "Evitas tecnicismos innecesarios, usas un tono cálido y cercano, y nunca olvidas que estás hablando con una persona. "
+        "Puedes usar humor suave, hacer preguntas cuando es adecuado, y mostrar interés genuino en lo que te cuentan. "
+        "Tu propósito es acompañar, escuchar y conversar, no solo responder."
+    )
+}
+
+# Estimacion conservadora (~3 caracteres por token) de los tokens del prompt de sistema.
+# Ollama conserva estos tokens al desplazar el contexto, asi el prefijo sigue en la KV cache.
+N_SYS_TOKENS = len(INITIAL_PROMPT["content"]) // 3 + 1
+
+# Se anexa a una respuesta cortada (barge-in) para que el modelo no la tome por completa
+INTERRUPTED_MARKER = "[interrumpido por el usuario]"
+
+
+# Los mensajes cortos se repiten mucho ("sí", "vale", "gracias"): se reutiliza el
+# mismo dict en lugar de crear uno nuevo por turno. No se deben modificar en sitio.
+@functools.lru_cache(maxsize=128)
+def _build_message(role, content):
+    return {'role': role, 'content': content}
+
+
+class SanctuaryChat:
+    """Sesion de conversacion con Ollama que conserva el historial entre turnos.
+
+    Reenviar siempre el mismo prefijo (prompt de sistema + turnos previos) permite
+    que el servidor reutilice su KV cache en lugar de re-procesar todo el prompt.
+    """
+
+    def __init__(
+        self,
+        model=MODEL_NAME,
+        *,
+        max_turns=8,
+        num_ctx=4096,
+        keep_alive="30m",
+    ):
+        self.model = model
+        self.max_turns = max_turns
+        self.keep_alive = keep_alive
+        self.options = {"num_ctx": num_ctx, "num_keep": N_SYS_TOKENS}
+        # Se almacenan los mensajes en un array para persistir el contexto
+        self.messages = [INITIAL_PROMPT]
+
+    def _add_message(self, role, content):
+        self.messages.append(_build_message(role, content))
+
+    def _trim_history(self):
+        # Ventana deslizante: prompt de sistema + ultimos ``max_turns`` turnos completos
+        max_messages = 1 + 2 * self.max_turns
+        if len(self.messages) > max_messages:
+            del self.messages[1:len(self.messages) - max_messages + 1]
+
+    def answer(self, user_message):
+        print("Usuario:", user_message)
+        self._add_message('user', user_message)
+
+        response: ChatResponse = chat(
+            model=self.model,
+            messages=self.messages,
+            options=self.options,
+            keep_alive=self.keep_alive,
         )
-    }
 
-    # Se almacenan los mensajes en un array para futura persistencia del contexto
-    messages = [initial_prompt]
+        self._add_message('assistant', response.message.content)
+        self._trim_history()
+        print("Sanctuary:", response.message.content)
 
+        return response.message.content
 
-    # Se agregan los mensajes del usuario y del asistente al array
-    print("Usuario:", user_message)
 
-    messages.append(
-        {
-            'role': 'user',
-            'content': user_message,
-        }
-    )
+class OllamaStreamingLLM(SanctuaryChat, LLMInterface):
+    """Adaptador de :class:`SanctuaryChat` al contrato ``generate_stream`` del orquestador.
 
-    response: ChatResponse = chat(model='hf.co/TheBloke/Mistral-7B-Instruct-v0.2-GGUF:Q4_K_M', messages=messages)
+    Los fragmentos se emiten conforme llegan del servidor, de modo que el TTS
+    puede empezar a hablar con el primer token en lugar de esperar la respuesta completa.
+    """
 
-    messages.append(
-        {
-            'role': 'assistant',
-            'content': response.message.content,
-        }
-    )
+    def __init__(self, model=MODEL_NAME, *, host=None, **kwargs):
+        super().__init__(model, **kwargs)
+        self._client = AsyncClient(host=host)
+        # Fragmentos del turno en curso; None cuando su respuesta ya esta en el historial
+        self._reply_parts = None
+
+    def _record_reply(self, parts, completed):
+        text = "".join(parts)
+        if not completed:
+            text = f"{text} {INTERRUPTED_MARKER}" if text else INTERRUPTED_MARKER
+        self._add_message('assistant', text)
+        self._trim_history()
+
+    async def generate_stream(self, prompt: str) -> AsyncIterator[str]:
+        # Un generador cancelado puede cerrarse despues de que empiece el turno
+        # siguiente: su respuesta se registra aqui, antes del nuevo mensaje del usuario.
+        if self._reply_parts is not None:
+            self._record_reply(self._reply_parts, completed=False)
+        self._add_message('user', prompt)
+        parts = self._reply_parts = []
+        completed = False
+        try:
+            stream = await self._client.chat(
+                model=self.model,
+                messages=self.messages,
+                options=self.options,
+                keep_alive=self.keep_alive,
+                stream=True,
+            )
+            async for part in stream:
+                content = part["message"]["content"]
+                if content:
+                    parts.append(content)
+                    yield content
+            completed = True
+        finally:
+            # Solo si el turno no fue ya registrado por el siguiente; una respuesta
+            # interrumpida se guarda truncada y marcada como tal.
+            if parts is self._reply_parts:
+                self._reply_parts = None
+                self._record_reply(parts, completed)
 
-    print("Sanctuary:", response.message.content)
 
+_default_chat = None
 
-    return response.message.content
\ No newline at end of file
+
+# Se genera una respuesta a traves del audio procesado y convertido a texto del usuario
+def answer_generation(user_message):
+    global _default_chat
+    if _default_chat is None:
+        _default_chat = SanctuaryChat()
+    return _default_chat.answer(user_message)
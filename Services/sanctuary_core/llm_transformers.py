@@ -2,22 +2,50 @@
 from __future__ import annotations
 
 import asyncio
+import copy
+import functools
+import os
 import threading
-from typing import AsyncIterator, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional
 
 import torch
 from transformers import (
     AutoModelForCausalLM,
     AutoTokenizer,
     StoppingCriteria,
+    StoppingCriteriaList,
     TextIteratorStreamer,
 )
 
 from .interfaces import LLMInterface
 
 
+# Initial size of the host staging buffer (ids + attention mask for a batch).
+_STAGING_MIN_TOKENS = 2 * 8 * 1024
+
+
 class TransformersStreamingLLM(LLMInterface):
-    """Generate tokens incrementally using a local transformer model."""
+    """Generate tokens incrementally using a local transformer model.
+
+    Concurrent calls to :meth:`generate_stream` are batched continuously:
+    prompts that arrive within ``batch_wait_ms`` of each other share a single
+    ``model.generate`` call and tokens are fanned out to each caller.  Each
+    call only decodes ``segment_tokens`` tokens; between segments finished rows
+    leave the batch and prompts that arrived meanwhile join it, so a new
+    session waits for one segment instead of a whole reply.  Multi-row
+    segments grow with the longest reply so far, because those rows are
+    re-encoded from scratch each segment.
+
+    When ``draft_model_name`` is given, single-row batches use assisted
+    (speculative) generation: the small draft proposes several tokens and the
+    target verifies them in one forward pass.  The draft must share the
+    target's tokenizer.  A cached ``past_key_values`` only covers the target,
+    so assisted rows re-encode their prompt instead of reusing the prefix
+    cache: the draft speeds up every decoded token, the cache only the
+    prefill.
+    """
 
     def __init__(
         self,
@@ -28,74 +56,525 @@ class TransformersStreamingLLM(LLMInterface):
         stop_sequences: Optional[list[str]] = None,
         generation_kwargs: Optional[Dict] = None,
         system_prefix: str = "",
+        max_batch_size: int = 8,
+        batch_wait_ms: float = 5.0,
+        compile_model: bool = True,
+        kv_cache_entries: int = 4,
+        segment_tokens: int = 32,
+        draft_model_name: Optional[str] = None,
     ) -> None:
+        self._model_name = model_name
         self._tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self._model = AutoModelForCausalLM.from_pretrained(model_name)
+        if self._tokenizer.pad_token_id is None:
+            self._tokenizer.pad_token = self._tokenizer.eos_token
         self._device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self._model = AutoModelForCausalLM.from_pretrained(
+            model_name, torch_dtype=_preferred_dtype(self._device)
+        )
         self._model.to(self._device)
+        self._draft_model = None
+        if draft_model_name:
+            self._draft_model = AutoModelForCausalLM.from_pretrained(
+                draft_model_name, torch_dtype=_preferred_dtype(self._device)
+            )
+            self._draft_model.to(self._device)
+        self._system_prefix = system_prefix
+        # The prefix is constant: tokenize it once and only encode the user prompt per turn.
+        self._prefix_ids = (
+            self._tokenizer(system_prefix, return_tensors="pt", add_special_tokens=True)[
+                "input_ids"
+            ][0]
+            if system_prefix
+            else None
+        )
+        self._kv_cache = _PrefixKVCache(max_entries=kv_cache_entries)
+        # Runs before compilation so the pinned cache is not backed by CUDA graph buffers.
+        self._seed_prefix_cache()
+        if self._device.startswith("cuda"):
+            if compile_model:
+                self._compile()
+        else:
+            torch.set_float32_matmul_precision("high")
         self._max_new_tokens = max_new_tokens
+        self._segment_tokens = max(1, segment_tokens)
         self._stop_sequences = stop_sequences or []
+        self._stop_ids = (
+            self._tokenizer(self._stop_sequences, add_special_tokens=False)["input_ids"]
+            if self._stop_sequences
+            else []
+        )
         self._gen_kwargs = generation_kwargs or {
             "temperature": 0.7,
             "top_p": 0.95,
             "do_sample": True,
         }
-        self._system_prefix = system_prefix
+        # Prompt tokenization runs here so long prompts never block the event loop.
+        self._tok_pool = ThreadPoolExecutor(
+            max_workers=min(os.cpu_count() or 1, 4), thread_name_prefix="tokenizer"
+        )
+        self._tok_local = threading.local()
+        self._encode_prompt = functools.lru_cache(maxsize=128)(self._encode_prompt)
+        self._staging: Optional[torch.Tensor] = None
+        # One long-lived thread runs every ``generate`` call, keeping the CUDA
+        # context and compiled graphs warm across turns.
+        self._gen_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-generate")
+        self._scheduler = _BatchScheduler(
+            self._generate_batch,
+            self._gen_executor,
+            max_batch_size=max_batch_size,
+            max_wait_ms=batch_wait_ms,
+        )
 
     async def generate_stream(self, prompt: str) -> AsyncIterator[str]:
-        full_prompt = f"{self._system_prefix}{prompt}" if self._system_prefix else prompt
-        tokenized = self._tokenizer(full_prompt, return_tensors="pt")
-        inputs = {k: v.to(self._device) for k, v in tokenized.items()}
-        streamer = TextIteratorStreamer(
-            self._tokenizer, skip_special_tokens=True, skip_prompt=True
-        )
+        loop = asyncio.get_running_loop()
+        input_ids = await loop.run_in_executor(self._tok_pool, self._encode_prompt, prompt)
+        request = self._scheduler.submit(input_ids, self._max_new_tokens)
+        queue = request.queue
+        try:
+            while True:
+                item = await queue.get()
+                # Coalesce everything the decoder produced meanwhile into one
+                # yield, so bursts of tokens cost one wakeup downstream.
+                pieces = []
+                while isinstance(item, str):
+                    pieces.append(item)
+                    try:
+                        item = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        item = ""
+                        break
+                if pieces:
+                    yield "".join(pieces)
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+        finally:
+            # Lets the running batch stop decoding this row if the caller bails out.
+            request.cancelled = True
+
+    def _staging_view(self, *shape: int) -> torch.Tensor:
+        """Contiguous view over a reusable (pinned on CUDA) host buffer.
+
+        Only the generate worker thread touches it and each batch finishes
+        before the next one is staged, so reuse never races a pending copy.
+        """
+
+        size = 1
+        for dim in shape:
+            size *= dim
+        if self._staging is None or self._staging.numel() < size:
+            self._staging = torch.empty(
+                max(size, _STAGING_MIN_TOKENS),
+                dtype=torch.long,
+                pin_memory=self._device.startswith("cuda"),
+            )
+        return self._staging[:size].view(*shape)
+
+    def _compile(self) -> None:
+        # ``generate`` calls ``self.forward``, so compile that rather than wrapping the module.
+        try:
+            self._model.forward = torch.compile(
+                self._model.forward, mode="reduce-overhead", fullgraph=False
+            )
+        except Exception:  # pragma: no cover - torch without a working compiler
+            return
+        # Pay the compilation cost now instead of on the first user turn.
+        warmup = torch.tensor([[self._tokenizer.eos_token_id]], device=self._device)
+        with torch.inference_mode():
+            self._model.generate(
+                warmup, max_new_tokens=1, pad_token_id=self._tokenizer.pad_token_id
+            )
+
+    def _seed_prefix_cache(self) -> None:
+        """Encode the system prefix once and pin its KV cache for every session."""
+
+        if self._prefix_ids is None or self._kv_cache.disabled:
+            return
+        with torch.inference_mode():
+            output = self._model(self._prefix_ids.unsqueeze(0).to(self._device), use_cache=True)
+        if getattr(output, "past_key_values", None) is not None:
+            self._kv_cache.pin(self._prefix_ids, output.past_key_values)
+
+    def _encode_prompt(self, prompt: str) -> torch.Tensor:
+        """Return ``prefix + prompt`` ids; memoized, so callers must not mutate them."""
+
+        # HF tokenizers are not guaranteed thread-safe, so each pool thread owns one.
+        tokenizer = getattr(self._tok_local, "tokenizer", None)
+        if tokenizer is None:
+            tokenizer = AutoTokenizer.from_pretrained(self._model_name)
+            self._tok_local.tokenizer = tokenizer
+        if self._prefix_ids is None:
+            return tokenizer(prompt, return_tensors="pt")["input_ids"][0]
+        user_ids = tokenizer(prompt, return_tensors="pt", add_special_tokens=False)["input_ids"][0]
+        return torch.cat([self._prefix_ids, user_ids])
+
+    def _generate_batch(
+        self, batch: list["_GenerationRequest"], loop: asyncio.AbstractEventLoop
+    ) -> None:
+        """Decode one segment for every row of *batch*; executed off the event loop.
+
+        Rows that still have budget left get their ``input_ids`` extended with
+        the tokens produced here so the scheduler can resume them next segment.
+        """
+
+        try:
+            self._decode_segment(batch, loop)
+        except Exception as exc:  # pragma: no cover - surfaced to every caller
+            # Staging, the device copy and post-processing can fail too; every
+            # row still waiting must see the error instead of hanging.
+            _fail_requests(batch, loop, exc)
+
+    def _decode_segment(
+        self, batch: list["_GenerationRequest"], loop: asyncio.AbstractEventLoop
+    ) -> None:
+        pad_id = self._tokenizer.pad_token_id
+        max_len = max(req.input_ids.shape[-1] for req in batch)
+        staged = self._staging_view(2, len(batch), max_len)
+        input_ids, attention_mask = staged[0], staged[1]
+        input_ids.fill_(pad_id)
+        attention_mask.zero_()
+        for row, req in enumerate(batch):
+            length = req.input_ids.shape[-1]
+            # Decoder-only models need left padding so every row ends at the same step.
+            input_ids[row, max_len - length :] = req.input_ids
+            attention_mask[row, max_len - length :] = 1
+        # One async copy from pinned memory; generate() is ordered after it on the stream.
+        staged = staged.to(self._device, non_blocking=True)
+        input_ids, attention_mask = staged[0], staged[1]
+
+        segment = self._segment_tokens
+        if len(batch) > 1:
+            # Padded rows get no KV cache and re-encode prompt plus reply every
+            # segment; growing the segment with the longest reply keeps that
+            # re-prefill O(n log n) in the reply length instead of O(n^2).
+            segment = max(segment, max(len(req.tokens) for req in batch))
+        # Never run a row past its own budget, so every unfinished row has
+        # produced exactly ``segment`` tokens when generate returns.
+        segment = min(segment, min(req.remaining for req in batch))
+        streamer = _BatchTextIteratorStreamer(self._tokenizer, batch, loop)
+        criteria = [_CancelledRequestsCriteria(batch)]
+        stop_criteria = _StopSequencesCriteria(self._stop_ids) if self._stop_ids else None
+        if stop_criteria is not None:
+            criteria.append(stop_criteria)
 
         generation_kwargs = dict(self._gen_kwargs)
         generation_kwargs.update(
             {
                 "streamer": streamer,
-                "max_new_tokens": self._max_new_tokens,
-                "pad_token_id": self._tokenizer.eos_token_id,
+                "max_new_tokens": segment,
+                "pad_token_id": pad_id,
+                "stopping_criteria": StoppingCriteriaList(criteria),
+                "return_dict_in_generate": True,
             }
         )
-        if self._stop_sequences:
-            stop_ids = self._tokenizer(self._stop_sequences, add_special_tokens=False)[
-                "input_ids"
-            ]
-            generation_kwargs["stopping_criteria"] = _StopSequencesCriteria(stop_ids)
-
-        loop = asyncio.get_running_loop()
-        thread = threading.Thread(
-            target=self._model.generate,
-            kwargs={**inputs, **generation_kwargs},
-            daemon=True,
+        # KV reuse only applies to unpadded single-row batches, the common
+        # case for one voice session continuing from its previous prompt (or
+        # from its own previous segment).  The cached keys/values belong to
+        # the target model alone, so they are never combined with a draft.
+        single = len(batch) == 1
+        reuse_kv = single and self._draft_model is None
+        if reuse_kv:
+            past = self._kv_cache.lookup(batch[0].input_ids)
+            if past is not None:
+                generation_kwargs["past_key_values"] = past
+        elif single and self._draft_model is not None:
+            # transformers only supports assisted generation for batch size 1.
+            generation_kwargs["assistant_model"] = self._draft_model
+        with torch.inference_mode():
+            output = self._model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                **generation_kwargs,
+            )
+        sequences = output.sequences.cpu()
+        # A stop sequence completed on the very last step is never followed by
+        # padding, so it has to be checked here before the row is resumed.
+        stopped = (
+            stop_criteria(sequences, None).tolist()
+            if stop_criteria is not None
+            else [False] * len(batch)
         )
-        thread.start()
+        for row, req in enumerate(batch):
+            if req.done:
+                continue
+            req.remaining -= segment
+            if req.remaining <= 0 or stopped[row]:
+                streamer.finish(req)
+            else:
+                req.input_ids = sequences[row, max_len - req.input_ids.shape[-1] :]
+        if reuse_kv and getattr(output, "past_key_values", None) is not None:
+            self._kv_cache.store(sequences[0], output.past_key_values)
 
-        try:
-            while True:
-                token = await loop.run_in_executor(None, streamer.text_queue.get)
-                if token is None:
-                    break
-                yield token
-        finally:
-            thread.join(timeout=0.1)
+
+def _preferred_dtype(device: str) -> Optional[torch.dtype]:
+    if not device.startswith("cuda"):
+        return None
+    return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
 
 
 class StreamingLLM(TransformersStreamingLLM):
     """Alias kept for compatibility with the public API."""
 
 
+class _GenerationRequest:
+    """A prompt waiting for (or taking part in) a batched generation."""
+
+    def __init__(self, input_ids: torch.Tensor, max_new_tokens: int) -> None:
+        self.input_ids = input_ids
+        self.queue: "asyncio.Queue[object]" = asyncio.Queue()
+        self.cancelled = False
+        self.done = False
+        self.remaining = max_new_tokens
+        # Incremental decode state; survives across scheduling segments.
+        self.tokens: list[int] = []
+        self.prefix_offset = 0
+        self.read_offset = 0
+
+
+class _PrefixKVCache:
+    """Small FIFO of ``past_key_values`` keyed by the token ids they cover.
+
+    A pinned entry (the shared system prefix) is never evicted, so a fresh
+    session still skips re-encoding the prefix once the FIFO has rolled over.
+    """
+
+    def __init__(self, max_entries: int = 4) -> None:
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[int, tuple[torch.Tensor, Any]]" = OrderedDict()
+        self._pinned: Optional[tuple[torch.Tensor, Any]] = None
+        self._next_key = 0
+
+    @property
+    def disabled(self) -> bool:
+        return self._max_entries <= 0
+
+    def lookup(self, input_ids: torch.Tensor) -> Optional[Any]:
+        """Return a cache cropped to the longest prefix shared with *input_ids*.
+
+        A FIFO hit is removed and handed over without copying: ``generate``
+        extends it in place and the caller stores the result again.  Only the
+        pinned prefix, which must outlive the call, is copied.
+        """
+
+        best_overlap, best_key, best_past = 0, None, None
+        candidates = list(self._entries.items())
+        if self._pinned is not None:
+            candidates.append((None, self._pinned))
+        for key, (ids, past) in candidates:
+            span = min(ids.shape[-1], _cache_length(past), input_ids.shape[-1] - 1)
+            if span <= best_overlap:
+                continue
+            mismatch = (ids[:span] != input_ids[:span]).nonzero()
+            overlap = int(mismatch[0]) if mismatch.numel() else span
+            if overlap > best_overlap:
+                best_overlap, best_key, best_past = overlap, key, past
+        if best_past is None:
+            return None
+        if best_key is None:
+            return _crop_cache(best_past, best_overlap, copy_entry=True)
+        del self._entries[best_key]
+        return _crop_cache(best_past, best_overlap, copy_entry=False)
+
+    def pin(self, ids: torch.Tensor, past: Any) -> None:
+        self._pinned = (ids, past)
+
+    def store(self, ids: torch.Tensor, past: Any) -> None:
+        if self.disabled:
+            return
+        self._entries[self._next_key] = (ids, past)
+        self._next_key += 1
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+def _fail_requests(
+    batch: list[_GenerationRequest], loop: asyncio.AbstractEventLoop, exc: BaseException
+) -> None:
+    """Hand *exc* to every unfinished request; safe from any thread."""
+
+    for req in batch:
+        if not req.done:
+            req.done = True
+            loop.call_soon_threadsafe(req.queue.put_nowait, exc)
+
+
+def _cache_length(past: Any) -> int:
+    if hasattr(past, "get_seq_length"):
+        return int(past.get_seq_length())
+    return int(past[0][0].shape[-2])
+
+
+def _crop_cache(past: Any, length: int, *, copy_entry: bool) -> Any:
+    """*past* truncated to *length* positions, copied first when *copy_entry* is set."""
+
+    if hasattr(past, "crop"):
+        cropped = copy.deepcopy(past) if copy_entry else past
+        cropped.crop(length)
+        return cropped
+    # Legacy tuple caches are never mutated by ``generate``, so views are enough.
+    return tuple(tuple(t[..., :length, :] for t in layer) for layer in past)
+
+
+class _BatchScheduler:
+    """Keep a running batch of requests and re-form it between segments."""
+
+    def __init__(
+        self,
+        run_batch,
+        executor: ThreadPoolExecutor,
+        *,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+    ) -> None:
+        self._run_batch = run_batch
+        self._executor = executor
+        self._max_batch = max(1, max_batch_size)
+        self._max_wait = max_wait_ms / 1000.0
+        self._pending: Optional["asyncio.Queue[_GenerationRequest]"] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def submit(self, input_ids: torch.Tensor, max_new_tokens: int) -> _GenerationRequest:
+        if self._task is None or self._task.done():
+            self._pending = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        request = _GenerationRequest(input_ids, max_new_tokens)
+        self._pending.put_nowait(request)
+        return request
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        active: list[_GenerationRequest] = []
+        while True:
+            if not active:
+                active.append(await self._pending.get())
+                deadline = loop.time() + self._max_wait
+                while len(active) < self._max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        active.append(await asyncio.wait_for(self._pending.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            else:
+                # Prompts that arrived during the last segment join without waiting.
+                while len(active) < self._max_batch and not self._pending.empty():
+                    active.append(self._pending.get_nowait())
+            active = [req for req in active if not req.cancelled]
+            if not active:
+                continue
+            try:
+                await loop.run_in_executor(self._executor, self._run_batch, active, loop)
+            except Exception as exc:
+                # A failing batch only fails its own rows; the loop keeps
+                # serving, so queued prompts are neither stranded nor lost.
+                _fail_requests(active, loop, exc)
+            active = [req for req in active if not req.done]
+
+
+class _BatchTextIteratorStreamer(TextIteratorStreamer):
+    """Streamer that splits batched tokens by row into per-request queues.
+
+    Text is decoded incrementally: each step only decodes the tokens since the
+    last emitted offset (plus the previous read window, so tokenizers that
+    encode leading spaces in the token still render them correctly) instead
+    of re-decoding the whole growing sequence.  The offsets live on each
+    request, so a row resumed in a later segment continues where it stopped.
+    """
+
+    def __init__(
+        self,
+        tokenizer,
+        batch: list[_GenerationRequest],
+        loop: asyncio.AbstractEventLoop,
+    ) -> None:
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self._batch = batch
+        self._loop = loop
+
+    def put(self, value: torch.Tensor) -> None:
+        if self.skip_prompt and self.next_tokens_are_prompt:
+            self.next_tokens_are_prompt = False
+            return
+        # Regular decoding puts one token per row; assisted generation puts
+        # every draft token the target accepted in that step.
+        rows = value.reshape(len(self._batch), -1).tolist()
+        finished_ids = {self.tokenizer.eos_token_id, self.tokenizer.pad_token_id}
+        for req, tokens in zip(self._batch, rows):
+            if req.done:
+                continue
+            for token in tokens:
+                if token in finished_ids:
+                    self.finish(req)
+                    break
+                req.tokens.append(token)
+            if not req.done:
+                self._emit(req, self._decode_delta(req, final=False))
+
+    def end(self) -> None:
+        # Unfinished rows resume in the next segment; the scheduler finishes
+        # them once their budget runs out.
+        self.next_tokens_are_prompt = True
+
+    def fail(self, exc: BaseException) -> None:
+        _fail_requests(self._batch, self._loop, exc)
+
+    def finish(self, req: _GenerationRequest) -> None:
+        if req.done:
+            return
+        if req.read_offset < len(req.tokens):
+            self._emit(req, self._decode_delta(req, final=True))
+        req.done = True
+        self._loop.call_soon_threadsafe(req.queue.put_nowait, None)
+
+    def _decode_delta(self, req: _GenerationRequest, *, final: bool) -> str:
+        tokens = req.tokens
+        prefix, read = req.prefix_offset, req.read_offset
+        prefix_text = self.tokenizer.decode(tokens[prefix:read], **self.decode_kwargs)
+        new_text = self.tokenizer.decode(tokens[prefix:], **self.decode_kwargs)
+        # A trailing U+FFFD means a multi-byte character is still incomplete.
+        if len(new_text) <= len(prefix_text) or (new_text.endswith("\ufffd") and not final):
+            return ""
+        req.prefix_offset = read
+        req.read_offset = len(tokens)
+        return new_text[len(prefix_text) :]
+
+    def _emit(self, req: _GenerationRequest, text: str) -> None:
+        if text:
+            self._loop.call_soon_threadsafe(req.queue.put_nowait, text)
+
+
+class _CancelledRequestsCriteria(StoppingCriteria):
+    """Stop decoding rows whose caller stopped consuming the stream."""
+
+    def __init__(self, batch: list[_GenerationRequest]) -> None:
+        self._batch = batch
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.tensor(
+            [req.cancelled for req in self._batch], dtype=torch.bool, device=input_ids.device
+        )
+
+
 class _StopSequencesCriteria(StoppingCriteria):
-    """Simple stopping criteria matching token sequences."""
+    """Simple stopping criteria matching token sequences.
+
+    Runs on every decoding step, so the stop sequences are kept as int tuples
+    and compared against one ``tolist()`` of the tail instead of per-sequence
+    tensor ops.
+    """
 
     def __init__(self, stop_sequences: list[list[int]]) -> None:
-        self.stop_sequences = [torch.tensor(seq, dtype=torch.long) for seq in stop_sequences]
+        self._stop = [(tuple(seq), len(seq)) for seq in stop_sequences if seq]
+        self._max_len = max((length for _, length in self._stop), default=0)
 
-    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> bool:
-        for seq in self.stop_sequences:
-            if seq.numel() == 0:
-                continue
-            if torch.equal(input_ids[0, -seq.numel() :], seq.to(input_ids.device)):
-                return True
-        return False
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        if not self._max_len:
+            return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        tails = input_ids[:, -self._max_len :].tolist()
+        done = [
+            any(tuple(tail[-length:]) == seq for seq, length in self._stop if length <= len(tail))
+            for tail in tails
+        ]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
@@ -0,0 +1,64 @@
+"""Streaming LLM adapter backed by the vLLM async engine."""
+from __future__ import annotations
+
+import uuid
+from typing import AsyncIterator, Dict, Optional
+
+from vllm import AsyncEngineArgs, AsyncLLMEngine, SamplingParams
+
+from .interfaces import LLMInterface
+
+
+class VLLMStreamingLLM(LLMInterface):
+    """Generate tokens incrementally with vLLM.
+
+    The engine schedules every in-flight :meth:`generate_stream` call itself
+    (continuous batching over a paged KV cache), so one instance is meant to be
+    shared by all sessions.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "distilgpt2",
+        *,
+        max_new_tokens: int = 200,
+        stop_sequences: Optional[list[str]] = None,
+        generation_kwargs: Optional[Dict] = None,
+        system_prefix: str = "",
+        gpu_memory_utilization: float = 0.6,
+        engine_kwargs: Optional[Dict] = None,
+    ) -> None:
+        # Leave room on the GPU for Whisper and XTTS, which share the device.
+        args = AsyncEngineArgs(
+            model=model_name,
+            gpu_memory_utilization=gpu_memory_utilization,
+            enable_prefix_caching=True,
+            **(engine_kwargs or {}),
+        )
+        self._engine = AsyncLLMEngine.from_engine_args(args)
+        sampling = generation_kwargs or {"temperature": 0.7, "top_p": 0.95}
+        self._sampling = SamplingParams(
+            max_tokens=max_new_tokens,
+            stop=stop_sequences or None,
+            **sampling,
+        )
+        self._system_prefix = system_prefix
+
+    async def generate_stream(self, prompt: str) -> AsyncIterator[str]:
+        request_id = uuid.uuid4().hex
+        emitted = 0
+        finished = False
+        try:
+            async for output in self._engine.generate(
+                self._system_prefix + prompt, self._sampling, request_id
+            ):
+                completion = output.outputs[0]
+                # vLLM reports the cumulative text; only the new suffix is yielded.
+                if len(completion.text) > emitted:
+                    yield completion.text[emitted:]
+                    emitted = len(completion.text)
+                finished = output.finished
+        finally:
+            if not finished:
+                # Barge-in or cancellation: free the sequence's KV pages right away.
+                await self._engine.abort(request_id)
@@ -1,14 +1,78 @@
 #Coordinador del pipeline
-from Services.sanctuary_core.llm_core import answer_generation
-from Services.sanctuary_tts.xtts_tts import voice_gen
-from Services.sanctuary_stt.whisper_stt import generate_text
-from Services.sanctuary_stt.audio_capture import audio_capture
+import asyncio
+import json
+import sys
+import wave
+
+import sounddevice as sd
+
+from Services.sanctuary_core.llm_core import OllamaStreamingLLM
+from Services.sanctuary_core.orchestrator import Orchestrator, SessionState
+from Services.sanctuary_core.vad import EnergyVAD
+from Services.sanctuary_stt.whisper_streaming import WhisperStreamingSTT
+from Services.sanctuary_tts.xtts_tts import XTTSStreamingTTS
+
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+DEFAULT_AUDIO = r"C:\Users\Zabdiel Julian\Downloads\Sanctuary_prod\Sanctuary\Services\sanctuary_stt\grabacion_test.wav"
+
+
+# Lee el archivo en frames de 20 ms como si fuera el microfono y luego envia
+# silencio hasta que el asistente termina de responder
+async def audio_chunks_from_file(path, orchestrator, frame_ms=FRAME_MS, min_tail_ms=1000):
+    with wave.open(path, "rb") as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2 or wav.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"{path} debe ser PCM int16 mono a {SAMPLE_RATE} Hz")
+        frame_samples = SAMPLE_RATE * frame_ms // 1000
+        while True:
+            pcm = wav.readframes(frame_samples)
+            if not pcm:
+                break
+            yield pcm
+            await asyncio.sleep(frame_ms / 1000)
+
+    silence = bytes(frame_samples * 2)
+    tail_ms = 0
+    while tail_ms < min_tail_ms or orchestrator.state != SessionState.LISTENING:
+        yield silence
+        tail_ms += frame_ms
+        await asyncio.sleep(frame_ms / 1000)
+
+
+async def send_json_stdout(payload):
+    print(json.dumps(payload, ensure_ascii=False))
+
+
+def make_audio_player(sample_rate):
+    stream = sd.RawOutputStream(samplerate=sample_rate, channels=1, dtype="int16")
+    stream.start()
+
+    async def send_audio_to_player(pcm):
+        await asyncio.get_running_loop().run_in_executor(None, stream.write, pcm)
+
+    return stream, send_audio_to_player
+
+
+async def run(audio_path):
+    stt = WhisperStreamingSTT(model_size="base", language="es", sample_rate=SAMPLE_RATE)
+    llm = OllamaStreamingLLM()
+    tts = XTTSStreamingTTS(sample_rate=SAMPLE_RATE)
+    vad = EnergyVAD(sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS)
+    orchestrator = Orchestrator(stt, llm, tts, vad, sample_rate=SAMPLE_RATE)
+
+    stream, send_audio_to_player = make_audio_player(tts.sample_rate)
+    try:
+        await orchestrator.handle_session(
+            audio_chunks_from_file(audio_path, orchestrator),
+            send_json_stdout,
+            send_audio_to_player,
+        )
+    finally:
+        stream.stop()
+        stream.close()
 
 
 # Ejecuta el programa
 if __name__ == "__main__":
-    voice_gen(
-        answer_generation(
-            generate_text(r"C:\Users\Zabdiel Julian\Downloads\Sanctuary_prod\Sanctuary\Services\sanctuary_stt\grabacion_test.wav")
-        )
-    )
+    asyncio.run(run(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_AUDIO))
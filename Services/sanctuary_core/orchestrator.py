@@ -3,9 +3,10 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
-from collections import deque
+import re
+import unicodedata
 from enum import Enum
-from typing import AsyncIterator, Awaitable, Callable, Deque, Optional
+from typing import AsyncIterator, Awaitable, Callable, Optional, Union
 
 from .interfaces import (
     LLMInterface,
@@ -16,6 +17,74 @@ from .interfaces import (
 )
 from .tracer import Tracer
 
+# LLM text is handed to TTS in sentence-sized pieces: on a boundary or once
+# the buffer grows past ``_MAX_SPEAK_CHARS``.
+_SENTENCE_END = re.compile(r"[.?!¿¡\n]\s*$")
+_MAX_SPEAK_CHARS = 120
+# Bounded so a fast LLM is back-pressured by a slower TTS instead of queueing forever.
+_SPEAK_QUEUE_SIZE = 8
+
+
+def _normalize_prompt(text: str) -> str:
+    """Lowercase *text* and drop punctuation so STT re-punctuation compares equal."""
+
+    kept = "".join(ch for ch in text.lower() if not unicodedata.category(ch).startswith("P"))
+    return " ".join(kept.split())
+
+
+def _noop(*args: object, **kwargs: object) -> None:
+    return None
+
+
+def _oneshot(fn: Callable[[], None]) -> Callable[[], None]:
+    """Return a callable that runs *fn* on its first call and is a no-op afterwards.
+
+    Lets per-chunk loops fire "first token/audio" marks without a flag check.
+    """
+
+    state = [fn]
+
+    def call() -> None:
+        f, state[0] = state[0], _noop
+        f()
+
+    return call
+
+
+class _Debouncer:
+    """Coalesce ``assistant_text`` pieces pushed within ``window_ms`` into one send."""
+
+    def __init__(
+        self, send_json: Callable[[object], Awaitable[None]], *, window_ms: float = 15.0
+    ) -> None:
+        self._send_json = send_json
+        self._window = window_ms / 1000.0
+        self._buf: list[str] = []
+        self._timer: Optional[asyncio.Task] = None
+
+    def push(self, text: str) -> None:
+        self._buf.append(text)
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self._send()
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._window)
+        self._timer = None
+        await self._send()
+
+    async def _send(self) -> None:
+        if not self._buf:
+            return
+        text = "".join(self._buf)
+        self._buf.clear()
+        await self._send_json({"type": "assistant_text", "text": text})
+
 
 class SessionState(str, Enum):
     IDLE = "IDLE"
@@ -34,46 +103,81 @@ class Orchestrator:
         tts: TTSInterface,
         vad: VADInterface,
         sample_rate: int = 16000,
+        *,
+        partial_delta: bool = False,
     ) -> None:
         self.stt = stt
         self.llm = llm
         self.tts = tts
         self.vad = vad
         self.sample_rate = sample_rate
+        # Send ``stt_partial_delta`` (changed suffix only) instead of full partials.
+        self._partial_delta = partial_delta
+        self._last_partial = ""
         self.state: SessionState = SessionState.LISTENING
-        self._speak_q: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
-        self._stop_speaking = asyncio.Event()
+        # Items are ``(generation, text)``; see ``_speak_gen``.
+        self._speak_q: "asyncio.Queue[Optional[tuple[int, str]]]" = asyncio.Queue(
+            maxsize=_SPEAK_QUEUE_SIZE
+        )
+        # Bumped on every barge-in/preemption: queued text and audio from an older
+        # generation are skipped, so interrupting never has to drain the queue.
+        self._speak_gen = 0
         self._llm_task: Optional[asyncio.Task] = None
-        self._pending_prompts: Deque[str] = deque()
+        self._text_batcher: Optional[_Debouncer] = None
+        # Single "latest wins" slot: a newer prompt replaces the queued one.
+        self._pending_prompt: Optional[str] = None
         self._stt_first_partial_emitted = False
         self._active_prompt: Optional[str] = None
-        self._last_prompt_text: Optional[str] = None
+        self._active_norm: Optional[str] = None
+        self._last_prompt_norm: Optional[str] = None
         self._awaiting_new_turn = True
+        self._speaking = False
 
     async def handle_session(
         self,
-        audio_chunks: AsyncIterator[bytes],
+        audio_chunks: Union[AsyncIterator[bytes], "asyncio.Queue[Optional[bytes]]"],
         send_json: Callable[[object], Awaitable[None]],
         send_audio: Callable[[bytes], Awaitable[None]],
     ) -> None:
-        """Drive a full conversational turn until the audio source completes."""
+        """Drive a full conversational turn until the audio source completes.
+
+        *audio_chunks* is either an async iterator of PCM frames or a queue
+        terminated by ``None``; a queue is consumed directly, without the extra
+        producer task per frame.
+        """
 
         tracer = Tracer()
         tracer.mark("turn_start")
+        self._text_batcher = _Debouncer(send_json)
         self.state = SessionState.LISTENING
         self._stt_first_partial_emitted = False
+        self._last_partial = ""
         self._awaiting_new_turn = True
-        self._pending_prompts.clear()
+        self._pending_prompt = None
         self._active_prompt = None
-        self._last_prompt_text = None
-        self._stop_speaking.clear()
+        self._active_norm = None
+        self._last_prompt_norm = None
 
+        mic_task: Optional[asyncio.Task] = None
+        if isinstance(audio_chunks, asyncio.Queue):
+            mic_q = audio_chunks
+        else:
+            # Capture runs in its own task so the source keeps draining while STT decodes.
+            mic_q = asyncio.Queue()
+            mic_task = asyncio.create_task(self._mic_producer(audio_chunks, mic_q))
         listen_task = asyncio.create_task(
-            self._listen_loop(audio_chunks, send_json, send_audio, tracer)
+            self._listen_loop(mic_q, send_json, send_audio, tracer)
         )
         speak_task = asyncio.create_task(self._speak_loop(send_audio, tracer))
 
-        await listen_task
+        try:
+            await listen_task
+        finally:
+            if mic_task is not None:
+                if not mic_task.done():
+                    mic_task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await mic_task
         # Ensure all pending speech has been processed before stopping the speaker loop.
         await self._speak_q.join()
         await self._speak_q.put(None)
@@ -86,34 +190,44 @@ class Orchestrator:
         tracer.dump()
 
     # ------------------------------------------------------------------
-    async def _listen_loop(
+    async def _mic_producer(
         self,
         audio_chunks: AsyncIterator[bytes],
+        q: "asyncio.Queue[Optional[bytes]]",
+    ) -> None:
+        try:
+            async for pcm in audio_chunks:
+                await q.put(pcm)
+        finally:
+            # Always terminate the consumer, even if the source raised.
+            q.put_nowait(None)
+
+    async def _listen_loop(
+        self,
+        mic_q: "asyncio.Queue[Optional[bytes]]",
         send_json: Callable[[object], Awaitable[None]],
         send_audio: Callable[[bytes], Awaitable[None]],
         tracer: Tracer,
     ) -> None:
         try:
-            async for pcm in audio_chunks:
+            while (pcm := await mic_q.get()) is not None:
                 user_is_speaking = self.vad.is_voice(pcm)
 
                 if self.state == SessionState.SPEAKING and user_is_speaking:
                     await self._interrupt_speaking()
                     self.state = SessionState.INTERRUPTED
 
+                # Silence is fed too so the STT buffer stays aligned with the audio.
+                await self.stt.feed(pcm, self.sample_rate)
                 if user_is_speaking:
                     if self._awaiting_new_turn:
                         self._awaiting_new_turn = False
-                        self._last_prompt_text = None
+                        self._last_prompt_norm = None
                     self.state = SessionState.LISTENING
-                    await self.stt.feed(pcm, self.sample_rate)
                     async for partial in self.stt.stream_partials():
                         await self._emit_partial(partial, send_json, tracer)
                         if partial.get("maybe_sentence_boundary"):
                             await self._maybe_start_llm(partial["text"], send_json, send_audio, tracer)
-                else:
-                    # still feed STT to keep buffers aligned
-                    await self.stt.feed(pcm, self.sample_rate)
 
                 if self.vad.endpointed():
                     final = await self.stt.get_final()
@@ -126,8 +240,10 @@ class Orchestrator:
                             "is_final": True,
                         }
                     )
+                    # The next utterance's partials start from scratch.
+                    self._last_partial = ""
                     await self._maybe_start_llm(
-                        final.get("text", ""), send_json, send_audio, tracer
+                        final.get("text", ""), send_json, send_audio, tracer, is_final=True
                     )
                     self.vad.reset()
                     self._awaiting_new_turn = True
@@ -147,13 +263,27 @@ class Orchestrator:
         if not self._stt_first_partial_emitted:
             tracer.mark("stt_first_partial")
             self._stt_first_partial_emitted = True
-        await send_json(
-            {
-                "type": "stt_partial",
-                "text": partial.get("text", ""),
-                "is_final": bool(partial.get("is_final", False)),
+        text = partial.get("text", "")
+        # Repeated partials (speaker pausing mid-word) carry no new information.
+        if text == self._last_partial:
+            return
+        is_final = bool(partial.get("is_final", False))
+        if self._partial_delta:
+            last = self._last_partial
+            base_len = 0
+            limit = min(len(text), len(last))
+            while base_len < limit and text[base_len] == last[base_len]:
+                base_len += 1
+            payload = {
+                "type": "stt_partial_delta",
+                "delta": text[base_len:],
+                "base_len": base_len,
+                "is_final": is_final,
             }
-        )
+        else:
+            payload = {"type": "stt_partial", "text": text, "is_final": is_final}
+        self._last_partial = text
+        await send_json(payload)
 
     async def _maybe_start_llm(
         self,
@@ -161,88 +291,139 @@ class Orchestrator:
         send_json: Callable[[object], Awaitable[None]],
         send_audio: Callable[[bytes], Awaitable[None]],
         tracer: Tracer,
+        *,
+        is_final: bool = False,
     ) -> None:
         prompt = text.strip()
         if not prompt:
             return
-        if self._active_prompt and prompt.startswith(self._active_prompt):
+        norm = _normalize_prompt(prompt)
+        if is_final and self._active_norm is not None and norm != self._active_norm:
+            # The final transcript beats whatever partial is still generating.
+            await self._preempt_llm()
+        if self._active_norm is not None and norm.startswith(self._active_norm):
             return
-        if not self._awaiting_new_turn and prompt == self._last_prompt_text:
+        if not self._awaiting_new_turn and norm == self._last_prompt_norm:
             return
-        if self.state in {SessionState.THINKING, SessionState.SPEAKING}:
-            # Already in progress, queue for later keeping the most recent version.
-            if not self._pending_prompts or self._pending_prompts[-1] != prompt:
-                self._pending_prompts.clear()
-                self._pending_prompts.append(prompt)
+        if self._active_prompt is not None:
+            # Generation in progress: keep only the most recent prompt for later.
+            self._pending_prompt = prompt
             return
 
         async def run(prompt_text: str) -> None:
-            self.state = SessionState.THINKING
-            self._active_prompt = prompt_text
-            self._last_prompt_text = prompt_text
-            self._awaiting_new_turn = False
-            first_chunk = True
+            gen = self._speak_gen
+
+            def first_token() -> None:
+                tracer.mark("llm_first_token")
+                self.state = SessionState.SPEAKING
+
+            mark_first = _oneshot(first_token)
+            buf: list[str] = []
+            buf_len = 0
             try:
                 async for chunk in self.llm.generate_stream(prompt_text):
-                    if self._stop_speaking.is_set():
+                    # A barge-in or preemption bumped the generation: this answer is stale.
+                    if gen != self._speak_gen:
                         break
-                    if first_chunk:
-                        tracer.mark("llm_first_token")
-                        self.state = SessionState.SPEAKING
-                        first_chunk = False
-                    await send_json({"type": "assistant_text", "text": chunk})
-                    await self._speak_q.put(chunk)
+                    mark_first()
+                    buf.append(chunk)
+                    buf_len += len(chunk)
+                    if buf_len > _MAX_SPEAK_CHARS or _SENTENCE_END.search(chunk):
+                        await self._flush_speech(buf, gen)
+                        buf_len = 0
+                else:
+                    await self._flush_speech(buf, gen)
             finally:
+                await self._text_batcher.flush()
+                if self._llm_task is not asyncio.current_task():
+                    # A newer generation owns the session state now.
+                    return
                 self._active_prompt = None
-                if self._stop_speaking.is_set():
-                    self._stop_speaking.clear()
-                if self._pending_prompts:
-                    next_prompt = self._pending_prompts.popleft()
+                self._active_norm = None
+                next_prompt, self._pending_prompt = self._pending_prompt, None
+                if next_prompt is not None:
                     await self._maybe_start_llm(next_prompt, send_json, send_audio, tracer)
-                else:
-                    # Completed speaking, go back to listening.
-                    self.state = SessionState.LISTENING
+                if self._active_prompt is None:
+                    # Done generating; listen again unless TTS still has text to play,
+                    # in which case ``_speak_loop`` switches back once it drains.
+                    if not self._speaking and self._speak_q.empty():
+                        self.state = SessionState.LISTENING
                     self._awaiting_new_turn = True
 
+        # Claim the slot before the task runs so prompts arriving meanwhile are queued.
+        self.state = SessionState.THINKING
+        self._active_prompt = prompt
+        self._active_norm = self._last_prompt_norm = norm
+        self._awaiting_new_turn = False
         self._llm_task = asyncio.create_task(run(prompt))
 
+    async def _preempt_llm(self) -> None:
+        """Stop the running generation and drop its not-yet-spoken text."""
+
+        task = self._llm_task
+        if task is None or task.done():
+            return
+        self._speak_gen += 1
+        await self._cancel_llm()
+
+    async def _cancel_llm(self) -> None:
+        task = self._llm_task
+        if task is None or task.done():
+            return
+        self._pending_prompt = None
+        # Cancel instead of waiting for the next chunk: a slow or stalled stream
+        # must not hold up the listen loop (VAD, barge-in, ``stt.feed``).
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    async def _flush_speech(self, buf: list[str], gen: int) -> None:
+        text = "".join(buf)
+        buf.clear()
+        if not text:
+            return
+        self._text_batcher.push(text)
+        await self._speak_q.put((gen, text))
+
     async def _speak_loop(
         self,
         send_audio: Callable[[bytes], Awaitable[None]],
         tracer: Tracer,
     ) -> None:
-        first_audio_emitted = False
+        mark_first_audio = _oneshot(lambda: tracer.mark("tts_first_audio"))
         while True:
-            text = await self._speak_q.get()
-            if text is None:
+            item = await self._speak_q.get()
+            if item is None:
                 self._speak_q.task_done()
                 break
+            gen, text = item
+            self._speaking = True
             try:
-                async for audio_chunk in self.tts.stream(text):
-                    if self._stop_speaking.is_set():
-                        break
-                    if not first_audio_emitted:
-                        tracer.mark("tts_first_audio")
-                        first_audio_emitted = True
-                    await send_audio(audio_chunk)
+                if gen == self._speak_gen:
+                    async for audio_chunk in self.tts.stream(text):
+                        if gen != self._speak_gen:
+                            break
+                        mark_first_audio()
+                        await send_audio(audio_chunk)
             finally:
+                self._speaking = False
                 self._speak_q.task_done()
+                if (
+                    self.state == SessionState.SPEAKING
+                    and self._active_prompt is None
+                    and self._speak_q.empty()
+                ):
+                    self.state = SessionState.LISTENING
 
     async def _interrupt_speaking(self) -> None:
-        if not self._stop_speaking.is_set():
-            self._stop_speaking.set()
+        # The generation bump alone stops both the LLM loop and playback, so no
+        # stop flag is left behind for the next answer to trip over.
+        self._speak_gen += 1
         await self.tts.stop()
-        self._pending_prompts.clear()
+        # A reply still streaming must not keep running next to the next turn's.
+        await self._cancel_llm()
+        self._pending_prompt = None
         self._active_prompt = None
-        self._last_prompt_text = None
+        self._active_norm = None
+        self._last_prompt_norm = None
         self._awaiting_new_turn = False
-        while True:
-            try:
-                item = self._speak_q.get_nowait()
-            except asyncio.QueueEmpty:
-                break
-            else:
-                if item is not None:
-                    # Pending text entries are discarded to avoid stale playback.
-                    pass
-                self._speak_q.task_done()
@@ -7,6 +7,11 @@ import time
 import uuid
 from typing import Dict, Iterable, Optional
 
+try:  # pragma: no cover - optional dependency
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
 
 class Tracer:
     """Collects timestamped events and emits JSON telemetry."""
@@ -14,13 +19,17 @@ class Tracer:
     def __init__(self, session_id: Optional[str] = None) -> None:
         self.sid = session_id or str(uuid.uuid4())
         self.events: list[dict] = []
+        # First timestamp per mark name, so lookups don't rescan ``events``.
+        self._marks: Dict[str, float] = {}
 
     def mark(self, name: str, meta: Optional[Dict] = None) -> None:
         """Record a timestamped event."""
 
+        t = time.perf_counter()
+        self._marks.setdefault(name, t)
         self.events.append(
             {
-                "t": time.perf_counter(),
+                "t": t,
                 "type": "mark",
                 "name": name,
                 "meta": meta or {},
@@ -50,32 +59,34 @@ class Tracer:
         """Print the collected events as newline-delimited JSON."""
 
         base = self.events[0]["t"] if self.events else time.perf_counter()
-        out = []
-        for event in self.events:
-            out.append(
-                {
-                    "session_id": self.sid,
-                    "type": event["type"],
-                    "name": event["name"],
-                    "t_ms": int((event["t"] - base) * 1000),
-                    "meta": event.get("meta", {}),
-                }
-            )
-        print(json.dumps(out, ensure_ascii=False))
+        sid = self.sid
+        out = [
+            {
+                "session_id": sid,
+                "type": event["type"],
+                "name": event["name"],
+                "t_ms": int((event["t"] - base) * 1000),
+                "meta": event.get("meta", {}),
+            }
+            for event in self.events
+        ]
+        if orjson is not None:
+            print(orjson.dumps(out).decode())
+        else:
+            print(json.dumps(out, ensure_ascii=False))
 
     # --- Metrics helpers -------------------------------------------------
     def _mark_time(self, name: str) -> Optional[float]:
-        for event in self.events:
-            if event["type"] == "mark" and event["name"] == name:
-                return event["t"]
-        return None
+        return self._marks.get(name)
 
     def metrics(self) -> Dict[str, int]:
         """Compute latency metrics for the voice turn."""
 
+        marks = self._marks
+
         def diff(start: str, end: str) -> Optional[int]:
-            t0 = self._mark_time(start)
-            t1 = self._mark_time(end)
+            t0 = marks.get(start)
+            t1 = marks.get(end)
             if t0 is None or t1 is None:
                 return None
             return int((t1 - t0) * 1000)
@@ -2,11 +2,73 @@
 from __future__ import annotations
 
 import collections
-import math
-from typing import Deque
+from typing import Deque, Tuple
+
+import numpy as np
 
 from .interfaces import VADInterface
 
+try:  # pragma: no cover - optional dependency
+    from numba import njit
+except ImportError:  # pragma: no cover - optional dependency
+    njit = None
+
+
+def _hysteresis(
+    rms: np.ndarray,
+    thresh: float,
+    silence_frames: int,
+    silence_run: int,
+    endpoint: bool,
+    voiced: np.ndarray,
+    endpoints: np.ndarray,
+) -> Tuple[int, bool]:
+    """Walk the per-frame RMS values through the voice/silence hysteresis.
+
+    Writes into the preallocated ``voiced``/``endpoints`` arrays and returns the
+    updated ``(silence_run, endpoint)`` state.  Plain Python so it can be
+    compiled with numba when available; the logic exists only here.
+    """
+
+    for i in range(rms.size):
+        if rms[i] > thresh:
+            silence_run = 0
+            endpoint = False
+            voiced[i] = True
+        else:
+            silence_run += 1
+            if silence_run >= silence_frames:
+                endpoint = True
+            voiced[i] = False
+        endpoints[i] = endpoint
+    return silence_run, endpoint
+
+
+if njit is not None:
+    # RMS values are finite, so fastmath's no-NaN/no-inf assumptions always hold.
+    _hysteresis = njit(cache=True, fastmath=True)(_hysteresis)
+
+
+def _vad_kernel(
+    samples: np.ndarray,
+    frame_len: int,
+    silence_frames: int,
+    thresh: float,
+    silence_run: int,
+    endpoint: bool,
+    voiced: np.ndarray,
+    rms: np.ndarray,
+    endpoints: np.ndarray,
+) -> Tuple[int, bool]:
+    """Compute the RMS of ``voiced.size`` frames of *samples*, then run the hysteresis."""
+
+    n = voiced.size
+    frames = samples[: n * frame_len].reshape(n, frame_len)
+    # einsum accumulates the squares in int64 without materialising them.
+    acc = np.einsum("ij,ij->i", frames, frames, dtype=np.int64)
+    rms[:] = np.sqrt(acc / frame_len)
+    return _hysteresis(rms, thresh, silence_frames, silence_run, endpoint, voiced, endpoints)
+
 
 class EnergyVAD(VADInterface):
     """A lightweight energy-based VAD suitable for unit testing."""
@@ -24,23 +86,60 @@ class EnergyVAD(VADInterface):
         effective_silence_ms = end_silence_ms if end_silence_ms is not None else silence_ms
         self.silence_frames = max(1, int(effective_silence_ms / frame_ms))
         self.voice_threshold = voice_threshold
+        self.frame_len = max(1, sample_rate * frame_ms // 1000)
         self._recent_energy: Deque[float] = collections.deque(maxlen=self.silence_frames)
         self._silence_run = 0
         self._endpoint = False
 
     def is_voice(self, pcm_bytes: bytes) -> bool:
-        if not pcm_bytes:
+        count = len(pcm_bytes) // 2
+        if count == 0:
             return False
-        rms = self._rms(pcm_bytes)
-        self._recent_energy.append(rms)
-        if rms > self.voice_threshold:
-            self._silence_run = 0
-            self._endpoint = False
-            return True
-        self._silence_run += 1
-        if self._silence_run >= self.silence_frames:
-            self._endpoint = True
-        return False
+        samples = np.frombuffer(pcm_bytes, dtype=np.int16, count=count)
+        if count >= 2 * self.frame_len:
+            # Coalesced chunk (several frames sent at once): classify per frame so
+            # the silence run still counts ``frame_ms`` steps.
+            voiced, _ = self._run_kernel(samples, self.frame_len, count // self.frame_len)
+            return bool(voiced.any())
+        voiced, _ = self._run_kernel(samples, count, 1)
+        return bool(voiced[0])
+
+    def process_batch(self, pcm_bytes: bytes) -> Tuple[np.ndarray, np.ndarray]:
+        """Classify every complete ``frame_ms`` frame in *pcm_bytes* in one call.
+
+        Returns ``(is_voice_mask, endpoint_indices)``; trailing samples that do
+        not fill a frame are ignored. State carries over exactly as if each frame
+        had been passed to :meth:`is_voice` in turn.
+        """
+
+        samples = np.frombuffer(pcm_bytes, dtype=np.int16, count=len(pcm_bytes) // 2)
+        n_frames = samples.size // self.frame_len
+        voiced, endpoints = self._run_kernel(samples, self.frame_len, n_frames)
+        # Indices where the endpoint flag goes up, i.e. where a segment ends.
+        rising = endpoints & ~np.concatenate(([False], endpoints[:-1]))
+        return voiced, np.flatnonzero(rising)
+
+    def _run_kernel(
+        self, samples: np.ndarray, frame_len: int, n_frames: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        voiced = np.zeros(n_frames, dtype=np.bool_)
+        rms = np.zeros(n_frames, dtype=np.float32)
+        endpoints = np.zeros(n_frames, dtype=np.bool_)
+        if n_frames == 0:
+            return voiced, endpoints
+        self._silence_run, self._endpoint = _vad_kernel(
+            samples,
+            frame_len,
+            self.silence_frames,
+            self.voice_threshold,
+            self._silence_run,
+            self._endpoint,
+            voiced,
+            rms,
+            endpoints,
+        )
+        self._recent_energy.extend(rms.tolist())
+        return voiced, endpoints
 
     def endpointed(self) -> bool:
         if self._endpoint:
@@ -52,15 +151,3 @@ class EnergyVAD(VADInterface):
         self._recent_energy.clear()
         self._silence_run = 0
         self._endpoint = False
-
-    @staticmethod
-    def _rms(pcm_bytes: bytes) -> float:
-        if not pcm_bytes:
-            return 0.0
-        count = len(pcm_bytes) // 2
-        if count == 0:
-            return 0.0
-        ints = memoryview(pcm_bytes).cast("h")
-        acc = sum(sample * sample for sample in ints)
-        mean = acc / count
-        return math.sqrt(mean)
@@ -2,7 +2,8 @@ import sounddevice as sd
 from scipy.io.wavfile import write
 import os
 
-sd.default.samplerate = 44100
+# Whisper trabaja a 16 kHz mono, se graba directamente en ese formato
+sd.default.samplerate = 16000
 
 def audio_capture():
     duracion = 5
@@ -10,12 +11,10 @@ def audio_capture():
 
     print("Grabando...")
 
-    audio = sd.rec(int(duracion * frecuencia_muestreo), samplerate=frecuencia_muestreo, channels=2, blocking=True)
+    audio = sd.rec(int(duracion * frecuencia_muestreo), samplerate=frecuencia_muestreo, channels=1, dtype="int16", blocking=True)
 
     print("Grabación finalizada.")
 
     if "grabacion_test.wav" in os.listdir():
         os.remove("grabacion_test.wav")
-        write("grabacion_test.wav", frecuencia_muestreo, audio)
-
-
+    write("grabacion_test.wav", frecuencia_muestreo, audio)
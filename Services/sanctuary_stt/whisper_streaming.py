@@ -1,24 +1,112 @@
-"""Streaming STT adapter backed by the open-source Whisper models."""
+"""Streaming STT adapter backed by Whisper models running on CTranslate2 (faster-whisper)."""
 from __future__ import annotations
 
 import asyncio
+import functools
 import time
 from asyncio import QueueEmpty
 from concurrent.futures import ThreadPoolExecutor
 from typing import AsyncIterator, Optional
 
+import ctranslate2
 import numpy as np
-import whisper
+from faster_whisper import WhisperModel
 
+from Services.sanctuary_core.audio_buffer import PCMRingBuffer
 from Services.sanctuary_core.interfaces import STTInterface, STTPartial
 
 
-def _pcm16_to_float32(pcm: bytes) -> np.ndarray:
+_INT16_SCALE = np.float32(1.0 / 32768.0)
+# Trailing punctuation that flags a possible sentence boundary in a partial.
+_BOUNDARY_CHARS = frozenset(".?!¡¿…,;:")
+# Segments ending this long before the end of the audio are treated as stable.
+_COMMIT_LAG_S = 1.0
+
+
+def _pcm16_to_float32(pcm: bytes | memoryview, out: Optional[np.ndarray] = None) -> np.ndarray:
     if not pcm:
         return np.array([], dtype=np.float32)
-    audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
-    audio /= 32768.0
-    return audio
+    # Cast and scale in a single pass instead of astype() + in-place divide.
+    src = np.frombuffer(pcm, dtype=np.int16)
+    if out is None:
+        return np.multiply(src, _INT16_SCALE, dtype=np.float32)
+    return np.multiply(src, _INT16_SCALE, out=out[: src.size])
+
+
+@functools.lru_cache(maxsize=4)
+def _load_model(
+    model_size: str,
+    device: str,
+    compute_type: str,
+    download_root: Optional[str],
+    num_workers: int = 1,
+) -> WhisperModel:
+    """Load (once per process) the CTranslate2 model shared by every session.
+
+    ``download_root`` keeps the converted weights on disk, so later processes
+    skip the download and start from the local copy.  ``num_workers`` lets
+    that many sessions decode in parallel on the shared model instead of
+    queueing behind each other.
+    """
+
+    return WhisperModel(
+        model_size,
+        device=device,
+        compute_type=compute_type,
+        download_root=download_root,
+        num_workers=num_workers,
+    )
+
+
+# CTranslate2 compute type per precision, as (CPU, CUDA).  INT8 keeps
+# activations in FP16 on GPU; on CPU it uses the VNNI/AVX2 int8 GEMMs.
+_PRECISIONS = {
+    "fp32": ("float32", "float32"),
+    "fp16": ("float32", "float16"),
+    "int8": ("int8", "int8_float16"),
+}
+
+
+def load_model(
+    model_size: str = "small",
+    *,
+    device: str = "auto",
+    compute_type: Optional[str] = None,
+    precision: str = "int8",
+    download_root: Optional[str] = None,
+    num_workers: int = 1,
+    warmup: bool = False,
+) -> WhisperModel:
+    """Resolve device/precision defaults and return the shared model handle.
+
+    ``precision`` picks the compute type for the device; an explicit
+    ``compute_type`` overrides it.  ``warmup`` runs one throwaway decode so
+    CTranslate2's lazy allocations and kernel selection happen at startup
+    rather than on the first partial of the first session.
+    """
+
+    if device == "auto":
+        device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    if compute_type is None:
+        if precision not in _PRECISIONS:
+            raise ValueError(
+                f"Unsupported STT precision {precision!r}; expected one of {sorted(_PRECISIONS)}"
+            )
+        cpu_type, cuda_type = _PRECISIONS[precision]
+        compute_type = cuda_type if device == "cuda" else cpu_type
+    model = _load_model(model_size, device, compute_type, download_root, max(1, num_workers))
+    if warmup:
+        _warm_up(model)
+    return model
+
+
+@functools.lru_cache(maxsize=4)
+def _warm_up(model: WhisperModel) -> None:
+    # One second of silence goes through the encoder and a decoder step; the
+    # language is fixed so detection is not part of the warm-up.
+    segments, _info = model.transcribe(np.zeros(16000, dtype=np.float32), language="en")
+    for _segment in segments:
+        pass
 
 
 class WhisperStreamingSTT(STTInterface):
@@ -28,6 +116,10 @@ class WhisperStreamingSTT(STTInterface):
     on a background :class:`ThreadPoolExecutor`.  Partial updates are emitted at
     a configurable cadence while the final result is produced once the caller
     invokes :meth:`get_final`.
+
+    Partials are chunk-aware: segments that have settled are committed and only
+    the audio after them is decoded again, conditioned on the committed text.
+    The final transcript re-scores the whole buffered window.
     """
 
     def __init__(
@@ -38,30 +130,51 @@ class WhisperStreamingSTT(STTInterface):
         sample_rate: int = 16000,
         partial_interval_ms: int = 150,
         endpoint_grace_ms: int = 350,
+        device: str = "auto",
+        compute_type: Optional[str] = None,
+        download_root: Optional[str] = None,
+        max_buffer_s: float = 30.0,
+        model: Optional[WhisperModel] = None,
     ) -> None:
-        self._model = whisper.load_model(model_size)
+        # A preloaded ``model`` lets many sessions share one set of weights;
+        # each instance then only owns its buffers and decode state.
+        self._model = model or load_model(
+            model_size, device=device, compute_type=compute_type, download_root=download_root
+        )
         self._language = language
         self.sample_rate = sample_rate
-        self._buffer = bytearray()
+        # Whisper only looks at 30 s windows, older audio is dropped.
+        self._buffer = PCMRingBuffer(int(max_buffer_s * sample_rate) * 2)
+        # Reused for every float32 snapshot. Safe because conversions and decodes
+        # both happen under ``_lock``, so a view is never overwritten mid-decode.
+        self._scratch_f32 = np.empty(self._buffer.max_bytes // 2, dtype=np.float32)
         self._partials: "asyncio.Queue[STTPartial]" = asyncio.Queue()
         self._final: Optional[STTPartial] = None
         self._lock = asyncio.Lock()
         self._partial_interval = partial_interval_ms / 1000.0
         self._last_partial_ts = 0.0
         self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper")
-        self._pending_partial_task: Optional[asyncio.Task] = None
+        # Bounded to one pending request: feed() never queues decodes behind decodes.
+        self._decode_requests: "asyncio.Queue[None]" = asyncio.Queue(maxsize=1)
+        self._decode_worker: Optional[asyncio.Task] = None
         self._endpoint_grace = endpoint_grace_ms / 1000.0
+        # Committed prefix: text that partials no longer re-decode.
+        self._committed_text = ""
+        self._committed_tokens: list[dict] = []
+        self._committed_bytes = 0
+        self._epoch = 0
 
     async def feed(self, pcm_bytes: bytes, sample_rate: int) -> None:
         del sample_rate  # Whisper handles resampling internally when needed.
         if not pcm_bytes:
             return
-        async with self._lock:
-            self._buffer.extend(pcm_bytes)
-            now = time.perf_counter()
-            if now - self._last_partial_ts >= self._partial_interval:
-                self._last_partial_ts = now
-                await self._schedule_partial(False)
+        # Never waits on a decode: audio is appended and at most one partial
+        # request is left for the worker.
+        self._buffer.extend(pcm_bytes)
+        now = time.perf_counter()
+        if now - self._last_partial_ts >= self._partial_interval:
+            self._last_partial_ts = now
+            self._request_partial()
 
     async def stream_partials(self) -> AsyncIterator[STTPartial]:
         while not self._partials.empty():
@@ -72,63 +185,110 @@ class WhisperStreamingSTT(STTInterface):
         # Give a small grace period so the last chunk can be decoded if the
         # caller immediately calls ``get_final`` after the last audio frame.
         await asyncio.sleep(self._endpoint_grace)
+        # Holding the lock waits out a partial that is still decoding.
         async with self._lock:
             if self._final is None:
-                await self._schedule_partial(True)
-            # ``_schedule_partial`` populates ``self._final`` for final calls.
-            while self._final is None:
-                await asyncio.sleep(0)
+                # The final re-scores the whole window in one pass.
+                audio = _pcm16_to_float32(self._buffer.snapshot(), self._scratch_f32)
+                self._final = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, self._decode_snapshot, audio, True
+                )
             result = self._final
             self._reset_state()
             return result
 
-    async def _schedule_partial(self, is_final: bool) -> None:
-        if self._pending_partial_task and not self._pending_partial_task.done():
-            if is_final:
-                # Wait for the running task to complete so we can emit a final.
-                await self._pending_partial_task
-            else:
-                return
+    def _request_partial(self) -> None:
+        try:
+            self._decode_requests.put_nowait(None)
+        except asyncio.QueueFull:
+            # A request is already waiting; it snapshots the newest audio anyway.
+            return
+        if self._decode_worker is None or self._decode_worker.done():
+            self._decode_worker = asyncio.create_task(self._run_decode_worker())
 
-        pcm_snapshot = bytes(self._buffer)
-        loop = asyncio.get_running_loop()
-        self._pending_partial_task = asyncio.create_task(
-            self._emit_partial(loop, pcm_snapshot, is_final)
-        )
-        if is_final:
-            await self._pending_partial_task
+    async def _run_decode_worker(self) -> None:
+        # Lives only while requests keep arriving, so no task outlives the session.
+        while not self._decode_requests.empty():
+            self._decode_requests.get_nowait()
+            async with self._lock:
+                await self._decode_partial()
 
-    async def _emit_partial(
-        self, loop: asyncio.AbstractEventLoop, pcm_snapshot: bytes, is_final: bool
-    ) -> None:
-        partial = await loop.run_in_executor(
-            self._executor, self._decode_snapshot, pcm_snapshot, is_final
+    async def _decode_partial(self) -> None:
+        # Converting straight from the buffer view into the scratch array doubles
+        # as the snapshot: no intermediate bytes() copy is needed and later
+        # ``feed`` calls cannot change what gets decoded.
+        # Partials only decode the audio after the committed prefix.
+        window_start = self._buffer.written - len(self._buffer)
+        tail_start = max(self._committed_bytes, window_start)
+        audio = _pcm16_to_float32(
+            self._buffer.snapshot()[tail_start - window_start :], self._scratch_f32
         )
-        if is_final:
-            self._final = partial
-        else:
-            await self._partials.put(partial)
+        epoch = self._epoch
+        segments = await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._transcribe, audio, self._committed_text
+        )
+        if epoch != self._epoch:
+            # The turn was reset while decoding; this result belongs to the old one.
+            return
+        await self._partials.put(self._commit_segments(segments, tail_start, audio.size))
+
+    def _commit_segments(
+        self, segments: list[tuple[str, float, float]], tail_start: int, n_samples: int
+    ) -> STTPartial:
+        """Move segments that are unlikely to change into the committed prefix.
+
+        Every segment but the last one that ends at least ``_COMMIT_LAG_S``
+        before the end of the decoded tail is committed; the rest stays
+        tentative and is decoded again on the next partial.
+        """
+
+        offset_s = tail_start / 2 / self.sample_rate
+        horizon = n_samples / self.sample_rate - _COMMIT_LAG_S
+        stable = 0
+        while stable < len(segments) - 1 and segments[stable][2] <= horizon:
+            stable += 1
+        for seg_text, t0, t1 in segments[:stable]:
+            self._committed_text += seg_text
+            self._committed_tokens.append(
+                {"t": seg_text.strip(), "t0": offset_s + t0, "t1": offset_s + t1}
+            )
+        if stable:
+            self._committed_bytes = tail_start + int(segments[stable - 1][2] * self.sample_rate) * 2
+
+        pending = segments[stable:]
+        text = (self._committed_text + "".join(seg[0] for seg in pending)).strip()
+        tokens = self._committed_tokens + [
+            {"t": seg_text.strip(), "t0": offset_s + t0, "t1": offset_s + t1}
+            for seg_text, t0, t1 in pending
+        ]
+        return self._build_partial(text, tokens, False)
 
-    def _decode_snapshot(self, pcm_snapshot: bytes, is_final: bool) -> STTPartial:
-        audio = _pcm16_to_float32(pcm_snapshot)
+    def _transcribe(
+        self, audio: np.ndarray, prompt: Optional[str] = None
+    ) -> list[tuple[str, float, float]]:
         if audio.size == 0:
-            return {"text": "", "is_final": is_final, "maybe_sentence_boundary": False}
-        result = self._model.transcribe(
+            return []
+        segments, _info = self._model.transcribe(
             audio,
             language=self._language,
-            fp16=False,
             word_timestamps=True,
+            # Committed text conditions the tail decode so it continues the sentence.
+            initial_prompt=prompt or None,
         )
-        text = result.get("text", "").strip()
-        tokens = [
-            {
-                "t": segment.get("text", "").strip(),
-                "t0": float(segment.get("start", 0.0)),
-                "t1": float(segment.get("end", 0.0)),
-            }
-            for segment in result.get("segments", [])
-        ]
-        maybe_boundary = bool(text) and text[-1] in {".", "?", "!", "¡", "¿", "…", ",", ";", ":"}
+        # ``segments`` is lazy: decoding happens while it is consumed here.
+        return [(segment.text, float(segment.start), float(segment.end)) for segment in segments]
+
+    def _decode_snapshot(self, audio: np.ndarray, is_final: bool) -> STTPartial:
+        segments = self._transcribe(audio)
+        if not segments:
+            return {"text": "", "is_final": is_final, "maybe_sentence_boundary": False}
+        text = "".join(seg_text for seg_text, _, _ in segments).strip()
+        tokens = [{"t": seg_text.strip(), "t0": t0, "t1": t1} for seg_text, t0, t1 in segments]
+        return self._build_partial(text, tokens, is_final)
+
+    @staticmethod
+    def _build_partial(text: str, tokens: list, is_final: bool) -> STTPartial:
+        maybe_boundary = bool(text) and text[-1] in _BOUNDARY_CHARS
         return {
             "text": text,
             "tokens": tokens,
@@ -147,5 +307,13 @@ class WhisperStreamingSTT(STTInterface):
                 break
             else:
                 self._partials.task_done()
-        self._pending_partial_task = None
+        while True:
+            try:
+                self._decode_requests.get_nowait()
+            except QueueEmpty:
+                break
+        self._committed_text = ""
+        self._committed_tokens = []
+        self._committed_bytes = 0
+        self._epoch += 1
 
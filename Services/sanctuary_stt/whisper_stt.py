@@ -1,3 +1,6 @@
+import functools
+import os
+
 import torch
 import whisper
 import time
@@ -10,16 +13,22 @@ def cuda_works():
 
 
 
+# El modelo se carga una sola vez por proceso y se reutiliza entre llamadas
+@functools.lru_cache(maxsize=1)
+def load_model(model_size="base"):
+    return whisper.load_model(model_size)
+
+
 def generate_text(audio_path):
 
-    if audio_path:
-        pass
-    else:
+    if not audio_path or not os.path.exists(audio_path):
         print(f"Audio con ruta {audio_path} no encontrado")
+        return ""
 
-    # Se llama al modelo y el audio a transcribir
-    model = whisper.load_model("base")
-    result = model.transcribe(audio = audio_path)
+    # Se llama al modelo y el audio a transcribir, sin registrar gradientes
+    model = load_model("base")
+    with torch.inference_mode():
+        result = model.transcribe(audio = audio_path)
 
 
     return result['text']
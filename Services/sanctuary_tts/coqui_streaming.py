@@ -10,9 +10,18 @@ from TTS.api import TTS
 from Services.sanctuary_core.interfaces import TTSInterface
 
 
-def _chunk_bytes(data: bytes, chunk_size: int) -> Iterable[bytes]:
-    for idx in range(0, len(data), chunk_size):
-        yield data[idx : idx + chunk_size]
+def _chunk_bytes(data: np.ndarray, chunk_size: int) -> Iterable[memoryview]:
+    # Las rebanadas de un memoryview son vistas, no copias del audio
+    view = memoryview(data).cast("B")
+    for idx in range(0, len(view), chunk_size):
+        yield view[idx : idx + chunk_size]
+
+
+def _to_pcm16(audio: np.ndarray) -> np.ndarray:
+    # Escala, recorta y convierte con un solo buffer intermedio en lugar de cuatro
+    scaled = np.multiply(audio, 32767.0, dtype=np.float32)
+    np.clip(scaled, -32767.0, 32767.0, out=scaled)
+    return scaled.astype(np.int16)
 
 
 class CoquiStreamingTTS(TTSInterface):
@@ -48,8 +57,7 @@ class CoquiStreamingTTS(TTSInterface):
         audio = np.asarray(wav, dtype=np.float32)
         if audio.ndim > 1:
             audio = audio.mean(axis=1)
-        pcm = np.clip(audio, -1.0, 1.0)
-        pcm_int16 = (pcm * 32767.0).astype(np.int16).tobytes()
+        pcm_int16 = _to_pcm16(audio)
         frame_bytes = self._chunk_samples * 2
         for chunk in _chunk_bytes(pcm_int16, frame_bytes):
             if self._stop_event.is_set():
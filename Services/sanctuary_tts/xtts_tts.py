@@ -2,39 +2,101 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import copy
 import importlib
+import math
+import threading
+from collections import OrderedDict
 from typing import AsyncIterator, Iterable, Optional
 
 import numpy as np
+import torch
 
-_transformers = importlib.import_module("transformers")
-if not hasattr(_transformers, "BeamSearchScorer"):
-    # Recent versions of ``transformers`` stopped re-exporting ``BeamSearchScorer``
-    # from the top-level package, while Coqui TTS still imports it from there.
-    # Mirror the old attribute so the dependency keeps working.
-    _beam_search = importlib.import_module("transformers.generation.beam_search")
-    _transformers.BeamSearchScorer = _beam_search.BeamSearchScorer
+from Services.sanctuary_core.interfaces import TTSInterface
 
-from TTS.api import TTS
+# Resampler polifasico: soxr si esta instalado, si no scipy y como ultimo recurso np.interp
+try:  # pragma: no cover - optional dependency
+    import soxr
+except ImportError:  # pragma: no cover - optional dependency
+    soxr = None
 
-from Services.sanctuary_core.interfaces import TTSInterface
+try:  # pragma: no cover - optional dependency
+    from scipy.signal import resample_poly
+except ImportError:  # pragma: no cover - optional dependency
+    resample_poly = None
 
 
-def _chunk_bytes(data: bytes, chunk_size: int) -> Iterable[bytes]:
-    for idx in range(0, len(data), chunk_size):
-        yield data[idx : idx + chunk_size]
+def _load_tts_class():
+    """Import Coqui ``TTS`` on first use instead of at module import time.
 
+    Importing this module stays cheap; the ``transformers`` generation stack
+    (and the compatibility shim below) is only loaded once a model is built.
+    """
 
-def _apply_fade_out(pcm: np.ndarray, fade_samples: int) -> np.ndarray:
-    if fade_samples <= 0 or pcm.size == 0:
-        return pcm
-    fade_samples = min(fade_samples, pcm.size)
-    fade_curve = np.linspace(1.0, 0.0, fade_samples, endpoint=True, dtype=np.float32)
-    pcm_tail = pcm[-fade_samples:]
-    pcm[-fade_samples:] = pcm_tail * fade_curve
+    _transformers = importlib.import_module("transformers")
+    if not hasattr(_transformers, "BeamSearchScorer"):
+        # Recent versions of ``transformers`` stopped re-exporting ``BeamSearchScorer``
+        # from the top-level package, while Coqui TTS still imports it from there.
+        # Mirror the old attribute so the dependency keeps working.
+        _beam_search = importlib.import_module("transformers.generation.beam_search")
+        _transformers.BeamSearchScorer = _beam_search.BeamSearchScorer
+
+    from TTS.api import TTS
+
+    return TTS
+
+
+def _chunk_bytes(data: np.ndarray, chunk_size: int) -> Iterable[memoryview]:
+    # Las rebanadas de un memoryview son vistas, no copias del audio
+    view = memoryview(data).cast("B")
+    for idx in range(0, len(view), chunk_size):
+        yield view[idx : idx + chunk_size]
+
+
+def _to_pcm16(
+    audio: np.ndarray,
+    scratch: Optional[np.ndarray] = None,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    # Escala, recorta y convierte con un solo buffer intermedio en lugar de cuatro;
+    # con ``scratch``/``out`` se reutilizan buffers y no se reserva memoria
+    n = audio.size
+    scaled = np.multiply(audio, 32767.0, dtype=np.float32, out=None if scratch is None else scratch[:n])
+    np.clip(scaled, -32767.0, 32767.0, out=scaled)
+    if out is None:
+        return scaled.astype(np.int16)
+    pcm = out[:n]
+    np.copyto(pcm, scaled, casting="unsafe")
     return pcm
 
 
+class _PCMCache:
+    """LRU of synthesized PCM16 keyed by (normalized text, voice, language)."""
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self._max_entries = max(0, max_entries)
+        self._entries: "OrderedDict[tuple, bytes]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_entries > 0
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        pcm = self._entries.get(key)
+        if pcm is not None:
+            self._entries.move_to_end(key)
+        return pcm
+
+    def put(self, key: tuple, pcm: bytes) -> None:
+        if not self.enabled:
+            return
+        self._entries[key] = pcm
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
 class XTTSStreamingTTS(TTSInterface):
     """Generate PCM16 audio chunks from text with barge-in friendly fade out."""
 
@@ -47,62 +109,204 @@ class XTTSStreamingTTS(TTSInterface):
         sample_rate: int = 16000,
         jitter_ms: int = 150,
         fade_out_ms: int = 60,
+        device: Optional[str] = None,
+        stream_chunk_size: int = 20,
+        cache_size: int = 256,
+        cache_max_s: float = 2.0,
     ) -> None:
-        self._tts = TTS(model_name)
+        self._device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self._tts = _load_tts_class()(model_name).to(self._device)
         self._speaker_wav = speaker_wav
         self._language = language
         self._native_rate = int(self._tts.synthesizer.output_sample_rate)
         self.sample_rate = sample_rate or self._native_rate
         self._frame_samples = max(1, int(self.sample_rate * jitter_ms / 1000))
         self._fade_samples = int(self.sample_rate * fade_out_ms / 1000)
+        # La rampa de fade-out es siempre la misma, se construye una sola vez
+        self._fade_curve = np.linspace(1.0, 0.0, self._fade_samples, endpoint=True, dtype=np.float32)
         self._stop_event = asyncio.Event()
+        self._reset_scratch()
+        self._stream_chunk_size = stream_chunk_size
+        # El streaming de XTTS necesita los latentes de la voz; se calculan una sola vez
+        self._xtts = getattr(self._tts.synthesizer, "tts_model", None)
+        self._cond_latents = None
+        if speaker_wav and hasattr(self._xtts, "inference_stream"):
+            with self._inference_context():
+                self._cond_latents = self._xtts.get_conditioning_latents(audio_path=[speaker_wav])
 
-    async def stream(self, text: str) -> AsyncIterator[bytes]:
-        self._stop_event.clear()
-        loop = asyncio.get_running_loop()
+        # Serialises synthesis when several sessions share this model.
+        self._synth_lock = threading.Lock()
+        # Frases cortas repetidas ("hola", "no sé") se sirven sin volver a sintetizar
+        self._pcm_cache = _PCMCache(cache_size)
+        self._cache_max_samples = int(self.sample_rate * cache_max_s)
 
-        def _synth() -> np.ndarray:
-            return self._tts.tts(
-                text=text,
-                speaker_wav=self._speaker_wav,
-                language=self._language,
-            )
+    def for_session(self) -> "XTTSStreamingTTS":
+        """Return a lightweight adapter that shares the loaded model.
 
-        wav = await loop.run_in_executor(None, _synth)
-        audio = np.asarray(wav, dtype=np.float32)
-        if audio.ndim > 1:
-            audio = audio.mean(axis=1)
-        if audio.size == 0:
-            return
-        pcm = np.clip(audio, -1.0, 1.0)
-        if self.sample_rate != self._native_rate:
-            pcm = self._resample(pcm, self._native_rate, self.sample_rate)
-        pcm_int16 = (pcm * 32767.0).astype(np.int16)
+        Weights, conditioning latents, the synthesis lock and the phrase cache
+        are shared; only the barge-in state is per session.
+        """
+
+        session = copy.copy(self)
+        session._stop_event = asyncio.Event()
+        session._reset_scratch()
+        return session
+
+    def _reset_scratch(self) -> None:
+        # Buffers de conversión reutilizados entre fragmentos; son por sesión porque
+        # los chunks emitidos son vistas sobre ``_i16_scratch``
+        self._f32_scratch = np.empty(0, dtype=np.float32)
+        self._i16_scratch = np.empty(0, dtype=np.int16)
+
+    def _ensure_scratch(self, size: int) -> None:
+        if self._i16_scratch.size < size:
+            capacity = max(size, 2 * self._i16_scratch.size)
+            self._f32_scratch = np.empty(capacity, dtype=np.float32)
+            self._i16_scratch = np.empty(capacity, dtype=np.int16)
+
+    async def stream(self, text: str) -> AsyncIterator[bytes]:
+        self._stop_event.clear()
 
         frame_bytes = self._frame_samples * 2
         yielded_final = False
-        for chunk in _chunk_bytes(pcm_int16.tobytes(), frame_bytes):
-            if self._stop_event.is_set():
-                tail = np.frombuffer(chunk, dtype=np.int16).astype(np.float32)
-                faded = _apply_fade_out(tail, self._fade_samples)
-                if faded.size:
-                    yield faded.astype(np.int16).tobytes()
-                yielded_final = True
+        async for pcm_int16 in self._pcm_fragments(text):
+            for chunk in _chunk_bytes(pcm_int16, frame_bytes):
+                if self._stop_event.is_set():
+                    tail = np.frombuffer(chunk, dtype=np.int16).astype(np.float32)
+                    faded = self._apply_fade_out(tail)
+                    if faded.size:
+                        yield faded.astype(np.int16).tobytes()
+                    yielded_final = True
+                    break
+                yield chunk
+            if yielded_final:
                 break
-            yield chunk
 
         if self._stop_event.is_set() and not yielded_final:
             # Provide a short silence tail to smooth the cutoff.
             silence = np.zeros(min(self._frame_samples, self._fade_samples), dtype=np.int16)
             yield silence.tobytes()
 
+    async def _pcm_fragments(self, text: str) -> AsyncIterator[np.ndarray]:
+        """Yield int16 PCM at ``sample_rate``, from the phrase cache when possible."""
+
+        key = (text.strip().lower(), self._speaker_wav, self._language)
+        cached = self._pcm_cache.get(key)
+        if cached is not None:
+            yield np.frombuffer(cached, dtype=np.int16)
+            return
+
+        pieces: Optional[list[bytes]] = [] if self._pcm_cache.enabled else None
+        total = 0
+        async for audio in self._synthesize(text):
+            if self.sample_rate != self._native_rate:
+                audio = self._resample(audio, self._native_rate, self.sample_rate)
+            # Recortar tras el remuestreo evita que el overshoot del filtro desborde int16
+            # Cada chunk ya fue enviado antes de pedir el siguiente fragmento, así que
+            # el buffer int16 se puede sobrescribir sin copiar
+            self._ensure_scratch(audio.size)
+            pcm_int16 = _to_pcm16(audio, self._f32_scratch, self._i16_scratch)
+            if pieces is not None:
+                total += pcm_int16.size
+                if total > self._cache_max_samples:
+                    pieces = None
+                else:
+                    # El scratch se reutiliza, así que lo que va a la caché se copia
+                    pieces.append(pcm_int16.tobytes())
+            yield pcm_int16
+        # Solo se guardan frases completas: un barge-in deja el generador sin terminar
+        if pieces and not self._stop_event.is_set():
+            self._pcm_cache.put(key, b"".join(pieces))
+
+    async def _synthesize(self, text: str) -> AsyncIterator[np.ndarray]:
+        """Yield float32 mono audio at the native rate as XTTS produces it.
+
+        With a cloned voice the model streams through ``inference_stream`` and
+        the first fragment arrives long before the utterance is finished;
+        otherwise the whole utterance comes from a single ``tts()`` call.
+        """
+
+        loop = asyncio.get_running_loop()
+        if self._cond_latents is None:
+            wav = await loop.run_in_executor(None, self._synth_full, text)
+            audio = np.asarray(wav, dtype=np.float32)
+            if audio.ndim > 1:
+                audio = audio.mean(axis=1)
+            if audio.size:
+                yield audio
+            return
+
+        queue: "asyncio.Queue[Optional[np.ndarray]]" = asyncio.Queue()
+        abandoned = threading.Event()
+
+        def _produce() -> None:
+            try:
+                with self._synth_lock, self._inference_context():
+                    gpt_cond_latent, speaker_embedding = self._cond_latents
+                    for chunk in self._xtts.inference_stream(
+                        text,
+                        self._language,
+                        gpt_cond_latent,
+                        speaker_embedding,
+                        stream_chunk_size=self._stream_chunk_size,
+                    ):
+                        if abandoned.is_set() or self._stop_event.is_set():
+                            break
+                        audio = chunk.squeeze().float().cpu().numpy()
+                        loop.call_soon_threadsafe(queue.put_nowait, audio)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        producer = loop.run_in_executor(None, _produce)
+        try:
+            while True:
+                audio = await queue.get()
+                if audio is None:
+                    break
+                if audio.size:
+                    yield audio
+        finally:
+            # Barge-in or an early exit: let the synthesis thread stop at the next chunk.
+            abandoned.set()
+            await producer
+
+    def _inference_context(self) -> contextlib.ExitStack:
+        # En GPU la inferencia corre en FP16; en CPU se queda en FP32
+        stack = contextlib.ExitStack()
+        stack.enter_context(torch.inference_mode())
+        if self._device.startswith("cuda"):
+            stack.enter_context(torch.autocast(device_type="cuda", dtype=torch.float16))
+        return stack
+
+    def _synth_full(self, text: str):
+        with self._synth_lock, self._inference_context():
+            return self._tts.tts(
+                text=text,
+                speaker_wav=self._speaker_wav,
+                language=self._language,
+            )
+
     async def stop(self) -> None:
         self._stop_event.set()
 
+    def _apply_fade_out(self, pcm: np.ndarray) -> np.ndarray:
+        fade_samples = min(self._fade_samples, pcm.size)
+        if fade_samples <= 0:
+            return pcm
+        # Se usa el final de la rampa para que el audio siempre termine en cero
+        pcm_tail = pcm[-fade_samples:]
+        np.multiply(pcm_tail, self._fade_curve[-fade_samples:], out=pcm_tail)
+        return pcm
+
     @staticmethod
     def _resample(pcm: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
         if src_rate == dst_rate or pcm.size == 0:
             return pcm
+        if soxr is not None:
+            return soxr.resample(pcm, src_rate, dst_rate).astype(np.float32, copy=False)
+        if resample_poly is not None:
+            g = math.gcd(src_rate, dst_rate)
+            return resample_poly(pcm, dst_rate // g, src_rate // g).astype(np.float32, copy=False)
         duration = pcm.size / src_rate
         dst_length = int(duration * dst_rate)
         if dst_length == 0:
@@ -3,13 +3,16 @@ from __future__ import annotations
 
 import asyncio
 import time
-from typing import AsyncIterator, Awaitable, Callable, Optional
+from typing import AsyncIterator, Awaitable, Callable, Optional, Union
 
+from Services.sanctuary_core.audio_buffer import PCMRingBuffer
 from Services.sanctuary_core.interfaces import STTInterface, STTPartial
 
 
-PartialDecoder = Callable[[bytes, int], Awaitable[STTPartial]]
-FinalDecoder = Callable[[bytes, int], Awaitable[STTPartial]]
+# Decoders receive a zero-copy view of the buffered audio; it is only valid
+# for the duration of the call.
+PartialDecoder = Callable[[Union[bytes, memoryview], int], Awaitable[STTPartial]]
+FinalDecoder = Callable[[Union[bytes, memoryview], int], Awaitable[STTPartial]]
 
 
 class StreamingSTT(STTInterface):
@@ -27,12 +30,13 @@ class StreamingSTT(STTInterface):
         *,
         partial_interval_ms: int = 150,
         endpoint_silence_ms: int = 300,
+        max_buffer_bytes: int = 30 * 16000 * 2,
     ) -> None:
         self._partial_decoder = partial_decoder
         self._final_decoder = final_decoder or partial_decoder
         self._partial_interval = partial_interval_ms / 1000.0
         self._endpoint_silence = endpoint_silence_ms / 1000.0
-        self._buffer = bytearray()
+        self._buffer = PCMRingBuffer(max_buffer_bytes)
         self._partials: "asyncio.Queue[STTPartial]" = asyncio.Queue()
         self._final: Optional[STTPartial] = None
         self._last_partial_time = 0.0
@@ -44,7 +48,7 @@ class StreamingSTT(STTInterface):
             self._buffer.extend(pcm_bytes)
             now = time.perf_counter()
             if now - self._last_partial_time >= self._partial_interval:
-                partial = await self._partial_decoder(bytes(self._buffer), sample_rate)
+                partial = await self._partial_decoder(self._buffer.snapshot(), sample_rate)
                 partial.setdefault("is_final", False)
                 partial.setdefault("maybe_sentence_boundary", False)
                 await self._partials.put(partial)
@@ -59,7 +63,7 @@ class StreamingSTT(STTInterface):
     async def get_final(self) -> STTPartial:
         async with self._lock:
             if self._final is None:
-                self._final = await self._final_decoder(bytes(self._buffer), 0)
+                self._final = await self._final_decoder(self._buffer.snapshot(), 0)
                 self._final.setdefault("is_final", True)
                 self._final.setdefault("maybe_sentence_boundary", True)
             return self._final
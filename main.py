@@ -2,9 +2,12 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import functools
 import json
+import logging
 import os
-from typing import AsyncIterator
+import time
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 
@@ -12,36 +15,57 @@ from Services.sanctuary_core.interfaces import LLMInterface, STTInterface, TTSIn
 from Services.sanctuary_core.orchestrator import Orchestrator
 from Services.sanctuary_core.vad import EnergyVAD
 from Services.sanctuary_core.llm_transformers import StreamingLLM
-from Services.sanctuary_stt.whisper_streaming import WhisperStreamingSTT
+from Services.sanctuary_stt.whisper_streaming import WhisperStreamingSTT, load_model as load_whisper_model
 from Services.sanctuary_tts.xtts_tts import XTTSStreamingTTS
 
-app = FastAPI()
+try:  # pragma: no cover - optional dependency
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
 
+logger = logging.getLogger(__name__)
 
-def _build_services(sample_rate: int, frame_ms: int) -> tuple[STTInterface, LLMInterface, TTSInterface, VADInterface]:
-    stt_model = os.getenv("SANCTUARY_STT_MODEL", "small")
-    stt_language = os.getenv("SANCTUARY_STT_LANGUAGE", "es")
-    partial_interval = int(os.getenv("SANCTUARY_STT_PARTIAL_MS", "150"))
-    stt = WhisperStreamingSTT(
-        model_size=stt_model,
-        language=stt_language,
-        sample_rate=sample_rate,
-        partial_interval_ms=partial_interval,
-    )
+# A stalled STT drops frames continuously; report overruns at most this often.
+_OVERRUN_LOG_INTERVAL_S = 5.0
 
-    llm_model = os.getenv("SANCTUARY_LLM_MODEL", "distilgpt2")
-    llm_prefix = os.getenv("SANCTUARY_LLM_SYSTEM_PREFIX", "")
-    max_tokens = int(os.getenv("SANCTUARY_LLM_MAX_TOKENS", "120"))
-    stop_sequences = tuple(
-        filter(None, os.getenv("SANCTUARY_LLM_STOP", "\n\n").split("|"))
-    )
-    llm = StreamingLLM(
-        model_name=llm_model,
-        system_prefix=llm_prefix,
-        max_new_tokens=max_tokens,
-        stop_sequences=list(stop_sequences) if stop_sequences else None,
+
+def _dumps(payload) -> str:
+    # Events stay text frames: the client treats every binary frame as audio.
+    if orjson is not None:
+        return orjson.dumps(payload).decode()
+    return json.dumps(payload)
+
+
+def _loads(text: str):
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch either.
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _load_shared_models(sample_rate: int) -> dict:
+    """Load the heavy models once per process; sessions only wrap them."""
+
+    stt_model = load_whisper_model(
+        os.getenv("SANCTUARY_STT_MODEL", "small"),
+        device=os.getenv("SANCTUARY_STT_DEVICE", "auto"),
+        compute_type=os.getenv("SANCTUARY_STT_COMPUTE_TYPE") or None,
+        precision=os.getenv("SANCTUARY_STT_PRECISION", "int8"),
+        download_root=os.getenv("SANCTUARY_STT_CACHE_DIR") or None,
+        num_workers=int(os.getenv("SANCTUARY_STT_WORKERS", "2")),
+        warmup=os.getenv("SANCTUARY_STT_WARMUP", "1") == "1",
     )
 
+    llm_backend = os.getenv("SANCTUARY_LLM_BACKEND", "transformers")
+    # Ollama keeps the model server-side and its wrapper holds the chat history,
+    # so it is built per session instead.
+    if llm_backend == "ollama":
+        llm = None
+    elif llm_backend == "vllm":
+        llm = _build_vllm_llm()
+    else:
+        llm = _build_transformers_llm()
+
     tts_model = os.getenv("SANCTUARY_TTS_MODEL", "tts_models/multilingual/multi-dataset/xtts_v2")
     tts_speaker = os.getenv("SANCTUARY_TTS_SPEAKER_WAV")
     tts_language = os.getenv("SANCTUARY_TTS_LANGUAGE", "es")
@@ -52,70 +76,229 @@ def _build_services(sample_rate: int, frame_ms: int) -> tuple[STTInterface, LLMI
         language=tts_language,
         sample_rate=sample_rate,
         jitter_ms=jitter_ms,
+        device=os.getenv("SANCTUARY_TTS_DEVICE") or None,
+        cache_size=int(os.getenv("SANCTUARY_TTS_CACHE_SIZE", "256")),
+    )
+    return {"stt_model": stt_model, "llm": llm, "tts": tts}
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    sample_rate = int(os.getenv("SANCTUARY_SR", "16000"))
+    models = _load_shared_models(sample_rate)
+    app.state.stt_model = models["stt_model"]
+    app.state.llm = models["llm"]
+    app.state.tts = models["tts"]
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+# Environment read on every connection; the parsed settings are cached per snapshot.
+_SESSION_ENV = (
+    "SANCTUARY_SR",
+    "SANCTUARY_FRAME_MS",
+    "SANCTUARY_STT_LANGUAGE",
+    "SANCTUARY_STT_PARTIAL_MS",
+    "SANCTUARY_STT_PARTIAL_DELTA",
+    "SANCTUARY_VAD_END_SILENCE_MS",
+    "SANCTUARY_AUDIO_QUEUE_FRAMES",
+    "SANCTUARY_LLM_MODEL",
+    "SANCTUARY_OLLAMA_HOST",
+)
+
+
+def _env_snapshot() -> tuple:
+    return tuple(os.environ.get(name) for name in _SESSION_ENV)
+
+
+@functools.lru_cache(maxsize=8)
+def _session_config(snapshot: tuple) -> dict:
+    """Parse the per-connection settings once per distinct environment.
+
+    Only plain values are cached: the STT/TTS/VAD wrappers and the
+    orchestrator hold per-session state and are still built per connection.
+    Callers must not mutate the returned dict.
+    """
+
+    env = dict(zip(_SESSION_ENV, snapshot))
+    return {
+        "sample_rate": int(env["SANCTUARY_SR"] or "16000"),
+        "frame_ms": int(env["SANCTUARY_FRAME_MS"] or "20"),
+        "stt_language": env["SANCTUARY_STT_LANGUAGE"] or "es",
+        "partial_interval_ms": int(env["SANCTUARY_STT_PARTIAL_MS"] or "150"),
+        "partial_delta": env["SANCTUARY_STT_PARTIAL_DELTA"] == "1",
+        "end_silence_ms": int(env["SANCTUARY_VAD_END_SILENCE_MS"] or "300"),
+        "audio_queue_frames": int(env["SANCTUARY_AUDIO_QUEUE_FRAMES"] or "50"),
+        "llm_model": env["SANCTUARY_LLM_MODEL"],
+        "ollama_host": env["SANCTUARY_OLLAMA_HOST"],
+    }
+
+
+def _build_session(
+    state, config: dict
+) -> tuple[STTInterface, LLMInterface, TTSInterface, VADInterface]:
+    """Create the per-connection wrappers around the shared models."""
+
+    sample_rate = config["sample_rate"]
+    stt = WhisperStreamingSTT(
+        language=config["stt_language"],
+        sample_rate=sample_rate,
+        partial_interval_ms=config["partial_interval_ms"],
+        model=state.stt_model,
     )
 
-    end_silence = int(os.getenv("SANCTUARY_VAD_END_SILENCE_MS", "300"))
-    vad = EnergyVAD(sample_rate=sample_rate, frame_ms=frame_ms, silence_ms=end_silence)
+    if state.llm is not None:
+        # The transformers/vLLM adapters are stateless per request and batch across sessions.
+        llm = state.llm
+    else:
+        from Services.sanctuary_core.llm_core import MODEL_NAME, OllamaStreamingLLM
+
+        llm = OllamaStreamingLLM(
+            model=config["llm_model"] or MODEL_NAME,
+            host=config["ollama_host"],
+        )
+
+    tts = state.tts.for_session()
+
+    vad = EnergyVAD(
+        sample_rate=sample_rate,
+        frame_ms=config["frame_ms"],
+        silence_ms=config["end_silence_ms"],
+    )
     return stt, llm, tts, vad
 
 
-async def _queue_iterator(queue: "asyncio.Queue[bytes | None]") -> AsyncIterator[bytes]:
-    while True:
-        chunk = await queue.get()
-        queue.task_done()
-        if chunk is None:
-            break
-        yield chunk
+def _llm_settings() -> dict:
+    stop_sequences = tuple(
+        filter(None, os.getenv("SANCTUARY_LLM_STOP", "\n\n").split("|"))
+    )
+    return {
+        "model_name": os.getenv("SANCTUARY_LLM_MODEL", "distilgpt2"),
+        "system_prefix": os.getenv("SANCTUARY_LLM_SYSTEM_PREFIX", ""),
+        "max_new_tokens": int(os.getenv("SANCTUARY_LLM_MAX_TOKENS", "120")),
+        "stop_sequences": list(stop_sequences) if stop_sequences else None,
+    }
+
+
+def _build_transformers_llm() -> LLMInterface:
+    return StreamingLLM(
+        draft_model_name=os.getenv("SANCTUARY_LLM_DRAFT_MODEL") or None,
+        **_llm_settings(),
+    )
+
+
+def _build_vllm_llm() -> LLMInterface:
+    # vLLM is an optional, GPU-only dependency; only import it when selected.
+    from Services.sanctuary_core.llm_vllm import VLLMStreamingLLM
+
+    return VLLMStreamingLLM(
+        gpu_memory_utilization=float(os.getenv("SANCTUARY_VLLM_GPU_MEMORY", "0.6")),
+        **_llm_settings(),
+    )
 
 
 @app.websocket("/voice")
 async def voice_endpoint(ws: WebSocket) -> None:
     await ws.accept()
-    audio_queue: "asyncio.Queue[bytes | None]" = asyncio.Queue()
+    config = _session_config(_env_snapshot())
+    # Bounded so a stalled STT cannot grow memory; ~1 s of 20 ms frames by default.
+    audio_queue: "asyncio.Queue[bytes | None]" = asyncio.Queue(
+        maxsize=config["audio_queue_frames"]
+    )
 
-    sample_rate = int(os.getenv("SANCTUARY_SR", "16000"))
-    frame_ms = int(os.getenv("SANCTUARY_FRAME_MS", "20"))
-    stt, llm, tts, vad = _build_services(sample_rate, frame_ms)
+    stt, llm, tts, vad = _build_session(ws.app.state, config)
     orchestrator = Orchestrator(
         stt=stt,
         llm=llm,
         tts=tts,
         vad=vad,
-        sample_rate=sample_rate,
+        sample_rate=config["sample_rate"],
+        partial_delta=config["partial_delta"],
     )
 
-    async def ws_send(payload) -> None:
-        if isinstance(payload, str):
-            await ws.send_text(payload)
-        else:
-            await ws.send_text(json.dumps(payload))
+    send_text = ws.send_text
 
-    async def ws_send_bytes(pcm: bytes) -> None:
-        await ws.send_bytes(pcm)
+    async def send_json(payload) -> None:
+        await send_text(_dumps(payload))
 
-    await ws_send({"type": "tts_metadata", "sample_rate": tts.sample_rate})
+    await send_json({"type": "tts_metadata", "sample_rate": tts.sample_rate})
 
+    # PCM goes straight to the bound send_bytes, without a wrapper coroutine per chunk.
     session_task = asyncio.create_task(
-        orchestrator.handle_session(_queue_iterator(audio_queue), ws_send, ws_send_bytes)
+        orchestrator.handle_session(audio_queue, send_json, ws.send_bytes)
     )
 
+    receive_task = asyncio.create_task(_pump_client(ws, audio_queue))
+    try:
+        # A failing session no longer leaves the endpoint blocked on receive().
+        await asyncio.wait({receive_task, session_task}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        if not receive_task.done():
+            receive_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await receive_task
+        _put_dropping_oldest(audio_queue, None)
+        await session_task
+
+
+def _put_dropping_oldest(queue: "asyncio.Queue[bytes | None]", item: "bytes | None") -> bool:
+    """Enqueue *item*, evicting the oldest frame when full; return whether one was dropped."""
+
+    try:
+        queue.put_nowait(item)
+        return False
+    except asyncio.QueueFull:
+        queue.get_nowait()
+        queue.put_nowait(item)
+        return True
+
+
+async def _pump_client(ws: WebSocket, audio_queue: "asyncio.Queue[bytes | None]") -> None:
+    """Feed client audio into *audio_queue* until the client ends the turn or leaves."""
+
+    # One reader only: Starlette allows a single receiver per socket, and
+    # receive_bytes()/receive_text() each fail on the other frame type.  Audio
+    # frames take the first branch with a single lookup and no suspension.
+    receive = ws.receive
+    enqueue = audio_queue.put_nowait
+    dropped = reported = 0
+    last_report = time.monotonic()
     try:
         while True:
-            message = await ws.receive()
-            msg_type = message.get("type")
-            if msg_type == "websocket.disconnect":
-                break
-            if message.get("bytes") is not None:
-                await audio_queue.put(message["bytes"])
-            elif message.get("text") is not None:
+            message = await receive()
+            pcm = message.get("bytes")
+            if pcm is not None:
                 try:
-                    data = json.loads(message["text"])
-                except json.JSONDecodeError:
-                    continue
-                if data.get("type") == "end_user_turn":
-                    break
+                    enqueue(pcm)
+                except asyncio.QueueFull:
+                    # Old audio is the least useful to a live transcript.
+                    _put_dropping_oldest(audio_queue, pcm)
+                    dropped += 1
+                    now = time.monotonic()
+                    if now - last_report >= _OVERRUN_LOG_INTERVAL_S:
+                        _log_overrun(dropped - reported)
+                        reported, last_report = dropped, now
+                continue
+            if message["type"] == "websocket.disconnect":
+                return
+            text = message.get("text")
+            # ``end_user_turn`` is the only control message; skip parsing anything else.
+            if text is None or "end_user_turn" not in text:
+                continue
+            try:
+                data = _loads(text)
+            except json.JSONDecodeError:
+                continue
+            if data.get("type") == "end_user_turn":
+                return
     except WebSocketDisconnect:
-        pass
+        return
     finally:
-        await audio_queue.put(None)
-        await session_task
+        if dropped > reported:
+            _log_overrun(dropped - reported)
+
+
+def _log_overrun(dropped: int) -> None:
+    logger.warning("audio_overrun: dropped %d frames", dropped)
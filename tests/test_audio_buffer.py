@@ -0,0 +1,78 @@
+import pathlib
+import random
+import sys
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from Services.sanctuary_core.audio_buffer import PCMRingBuffer
+
+
+def _pattern(start: int, size: int) -> bytes:
+    return bytes((start + i) % 251 for i in range(size))
+
+
+def test_wrap_around_keeps_latest_window():
+    buf = PCMRingBuffer(8)
+    written = b""
+    # 3-byte writes make the cursor hit the end of the backing store and compact.
+    for step in range(12):
+        chunk = _pattern(step * 3, 3)
+        buf.extend(chunk)
+        written += chunk
+        assert bytes(buf.snapshot()) == written[-8:]
+        assert len(buf) == min(len(written), 8)
+
+
+def test_write_larger_than_max_bytes():
+    buf = PCMRingBuffer(8)
+    buf.extend(_pattern(0, 4))
+    big = _pattern(100, 20)
+    buf.extend(big)
+    assert len(buf) == 8
+    assert buf.written == 24
+    assert bytes(buf.snapshot()) == big[-8:]
+    # Normal writes continue correctly after an oversized one.
+    buf.extend(b"\x01\x02")
+    assert bytes(buf.snapshot()) == big[-6:] + b"\x01\x02"
+
+
+def test_written_offset_locates_window_start():
+    buf = PCMRingBuffer(10)
+    stream = b""
+    rng = random.Random(0)
+    for _ in range(50):
+        chunk = _pattern(len(stream), rng.randrange(0, 7))
+        buf.extend(chunk)
+        stream += chunk
+        assert buf.written == len(stream)
+        start = buf.written - len(buf)
+        assert bytes(buf.snapshot()) == stream[start:]
+
+
+def test_snapshot_after_overflow_matches_reference():
+    buf = PCMRingBuffer(16)
+    stream = b""
+    rng = random.Random(1)
+    for _ in range(200):
+        chunk = _pattern(len(stream), rng.randrange(0, 40))
+        buf.extend(chunk)
+        stream += chunk
+        assert bytes(buf.snapshot()) == stream[-16:]
+
+
+def test_clear_resets_length_and_offset():
+    buf = PCMRingBuffer(8)
+    buf.extend(_pattern(0, 12))
+    buf.clear()
+    assert len(buf) == 0
+    assert buf.written == 0
+    assert bytes(buf.snapshot()) == b""
+    buf.extend(b"\x05\x06")
+    assert bytes(buf.snapshot()) == b"\x05\x06"
+    assert buf.written == 2
+
+
+def test_max_bytes_is_sample_aligned():
+    assert PCMRingBuffer(9).max_bytes == 8
@@ -0,0 +1,71 @@
+import asyncio
+import pathlib
+import sys
+
+import pytest
+
+pytest.importorskip("ollama")
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from Services.sanctuary_core.llm_core import INTERRUPTED_MARKER, OllamaStreamingLLM
+
+
+class FakeClient:
+    """Stream a fixed list of chunks per call, like ``AsyncClient.chat(stream=True)``."""
+
+    def __init__(self, chunks) -> None:
+        self._chunks = chunks
+
+    async def chat(self, **kwargs):
+        async def stream():
+            for chunk in self._chunks:
+                await asyncio.sleep(0)
+                yield {"message": {"content": chunk}}
+
+        return stream()
+
+
+def _make_llm(chunks) -> OllamaStreamingLLM:
+    llm = OllamaStreamingLLM()
+    llm._client = FakeClient(chunks)
+    return llm
+
+
+def _history(llm):
+    return [(message["role"], message["content"]) for message in llm.messages[1:]]
+
+
+def test_complete_reply_is_recorded_as_is():
+    llm = _make_llm(["Hola", ", ¿qué tal?"])
+
+    async def scenario():
+        async for _ in llm.generate_stream("hola"):
+            pass
+
+    asyncio.run(scenario())
+
+    assert _history(llm) == [("user", "hola"), ("assistant", "Hola, ¿qué tal?")]
+
+
+def test_interrupted_reply_is_marked_and_kept_before_next_turn():
+    llm = _make_llm(["Primera", " parte", " nunca dicha"])
+
+    async def scenario():
+        stale = llm.generate_stream("uno")
+        await stale.__anext__()
+        # Barge-in: the stale generator is only closed after the next turn starts.
+        async for _ in llm.generate_stream("dos"):
+            pass
+        await stale.aclose()
+
+    asyncio.run(scenario())
+
+    assert _history(llm) == [
+        ("user", "uno"),
+        ("assistant", f"Primera {INTERRUPTED_MARKER}"),
+        ("user", "dos"),
+        ("assistant", "Primera parte nunca dicha"),
+    ]
@@ -0,0 +1,166 @@
+import asyncio
+import pathlib
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from Services.sanctuary_core.llm_transformers import (
+    TransformersStreamingLLM,
+    _BatchScheduler,
+    _GenerationRequest,
+    _PrefixKVCache,
+)
+
+PREFIX = torch.tensor([5, 6, 7, 8])
+PROMPT = torch.tensor([5, 6, 7, 8, 9, 10])
+
+
+class StubTokenizer:
+    pad_token_id = 0
+    eos_token_id = 0
+
+    def decode(self, tokens, **kwargs) -> str:
+        return "".join(f"<{token}>" for token in tokens)
+
+
+class StubModel:
+    """Record the kwargs of every ``generate`` call and decode nothing."""
+
+    def __init__(self) -> None:
+        self.calls: list[dict] = []
+
+    def generate(self, input_ids, attention_mask, **kwargs):
+        self.calls.append(kwargs)
+        new = torch.full((input_ids.shape[0], kwargs["max_new_tokens"]), 1)
+        return SimpleNamespace(sequences=torch.cat([input_ids, new], dim=-1), past_key_values=None)
+
+
+def _legacy_past(length: int):
+    return ((torch.zeros(1, 1, length, 2), torch.zeros(1, 1, length, 2)),)
+
+
+def _make_llm(draft_model) -> TransformersStreamingLLM:
+    # Skip __init__: no weights are loaded, only the batch step is exercised.
+    llm = TransformersStreamingLLM.__new__(TransformersStreamingLLM)
+    llm._tokenizer = StubTokenizer()
+    llm._device = "cpu"
+    llm._staging = None
+    llm._segment_tokens = 4
+    llm._stop_ids = []
+    llm._gen_kwargs = {}
+    llm._model = StubModel()
+    llm._draft_model = draft_model
+    llm._kv_cache = _PrefixKVCache(max_entries=4)
+    llm._kv_cache.pin(PREFIX, _legacy_past(PREFIX.shape[-1]))
+    return llm
+
+
+def _generate_once(llm: TransformersStreamingLLM) -> dict:
+    loop = asyncio.new_event_loop()
+    try:
+        llm._generate_batch([_GenerationRequest(PROMPT, max_new_tokens=4)], loop)
+    finally:
+        loop.close()
+    assert len(llm._model.calls) == 1
+    return llm._model.calls[0]
+
+
+def test_cached_prefix_is_reused_without_draft():
+    kwargs = _generate_once(_make_llm(draft_model=None))
+
+    assert "past_key_values" in kwargs
+    assert "assistant_model" not in kwargs
+
+
+def test_draft_model_never_receives_target_cache():
+    draft = object()
+    kwargs = _generate_once(_make_llm(draft_model=draft))
+
+    assert kwargs["assistant_model"] is draft
+    assert "past_key_values" not in kwargs
+
+
+def test_scheduler_survives_a_failing_batch():
+    calls = []
+
+    def run_batch(batch, loop):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise RuntimeError("device lost")
+        for req in batch:
+            req.done = True
+            loop.call_soon_threadsafe(req.queue.put_nowait, None)
+
+    async def scenario():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            scheduler = _BatchScheduler(run_batch, executor, max_wait_ms=0)
+            failed = scheduler.submit(PROMPT, max_new_tokens=4)
+            error = await asyncio.wait_for(failed.queue.get(), 1.0)
+            served = scheduler.submit(PROMPT, max_new_tokens=4)
+            result = await asyncio.wait_for(served.queue.get(), 1.0)
+            return error, result
+
+    error, result = asyncio.run(scenario())
+
+    assert isinstance(error, RuntimeError)
+    assert result is None
+    assert calls == [1, 1]
+
+
+class CroppableCache:
+    """Minimal stand-in for ``DynamicCache``: only length and ``crop``."""
+
+    def __init__(self, length: int) -> None:
+        self.length = length
+
+    def get_seq_length(self) -> int:
+        return self.length
+
+    def crop(self, length: int) -> None:
+        self.length = length
+
+
+def test_prefix_cache_hands_over_fifo_entries_without_copying():
+    cache = _PrefixKVCache(max_entries=4)
+    pinned = CroppableCache(PREFIX.shape[-1])
+    cache.pin(PREFIX, pinned)
+    stored = CroppableCache(PROMPT.shape[-1])
+    cache.store(PROMPT, stored)
+    longer = torch.cat([PROMPT, torch.tensor([11, 12])])
+
+    first = cache.lookup(longer)
+    second = cache.lookup(longer)
+
+    assert first is stored
+    assert first.length == PROMPT.shape[-1]
+    # The entry was moved out, so the next lookup falls back to a copy of the pin.
+    assert second is not pinned
+    assert second.length == PREFIX.shape[-1]
+    assert pinned.length == PREFIX.shape[-1]
+
+
+def test_multi_row_segments_grow_with_the_reply():
+    llm = _make_llm(draft_model=None)
+    first = _GenerationRequest(PROMPT, max_new_tokens=100)
+    first.tokens = [1] * 10
+    second = _GenerationRequest(PROMPT, max_new_tokens=100)
+    loop = asyncio.new_event_loop()
+    try:
+        llm._generate_batch([first], loop)
+        first.tokens = [1] * 10
+        llm._generate_batch([first, second], loop)
+    finally:
+        loop.close()
+
+    single, multi = llm._model.calls
+    assert single["max_new_tokens"] == 4
+    assert multi["max_new_tokens"] == 10
@@ -58,21 +58,21 @@ def test_stt_partials_before_final():
 
 class CoordinatedLLM(ScriptedLLM):
     def __init__(self):
-        super().__init__(["uno", "dos", "tres"])
+        super().__init__(["uno.", " dos", " tres."])
         self.first_chunk = asyncio.Event()
         self.continue_event = asyncio.Event()
 
     async def generate_stream(self, prompt: str):
-        yield "uno"
+        yield "uno."
         self.first_chunk.set()
         await self.continue_event.wait()
-        yield "dos"
-        yield "tres"
+        yield " dos"
+        yield " tres."
 
 
 class InspectTTS(ScriptedTTS):
     def __init__(self):
-        super().__init__({"uno": [b"a"], "dos": [b"b"], "tres": [b"c"]})
+        super().__init__({"uno.": [b"a"], " dos tres.": [b"b"]})
         self.calls = []
         self.first_call = asyncio.Event()
 
@@ -103,13 +103,252 @@ def test_tts_starts_on_first_llm_chunk():
         task = asyncio.create_task(session())
         await asyncio.wait_for(llm.first_chunk.wait(), timeout=1.0)
         await asyncio.wait_for(tts.first_call.wait(), timeout=1.0)
-        assert tts.calls[0] == "uno"
+        assert tts.calls[0] == "uno."
         llm.continue_event.set()
         await task
 
     asyncio.run(runner())
 
 
+def test_llm_chunks_buffered_until_sentence_boundary():
+    async def runner():
+        stt = ScriptedSTT(
+            partials=[{"text": "hola", "is_final": False, "maybe_sentence_boundary": True}],
+            final={"text": "hola", "is_final": True, "maybe_sentence_boundary": True},
+        )
+        llm = ScriptedLLM(["ho", "la", " amigo.", " qué", " tal"])
+        tts = InspectTTS()
+        vad = ScriptedVAD([True, False], endpoint_after=2)
+        orchestrator = Orchestrator(stt=stt, llm=llm, tts=tts, vad=vad)
+
+        events = []
+        await run_orchestrator(orchestrator, audio_iter([b"chunk1", b"chunk2"]), events)
+
+        assert tts.calls == ["hola amigo.", " qué tal"]
+        texts = [
+            payload["text"]
+            for kind, payload in events
+            if kind == "text" and payload.get("type") == "assistant_text"
+        ]
+        # Sentences produced back-to-back are coalesced into one websocket message.
+        assert texts == ["hola amigo. qué tal"]
+
+    asyncio.run(runner())
+
+
+class RecordingLLM(ScriptedLLM):
+    def __init__(self, chunks=("vale.",), delay=0.0):
+        super().__init__(chunks, delay=delay)
+        self.prompts = []
+
+    async def generate_stream(self, prompt: str):
+        self.prompts.append(prompt)
+        async for chunk in super().generate_stream(prompt):
+            yield chunk
+
+
+class PromptLLM(ScriptedLLM):
+    """Answers each prompt with its own chunks so tests can tell answers apart."""
+
+    def __init__(self, answers, delay=0.0):
+        super().__init__([], delay=delay)
+        self.answers = answers
+        self.prompts = []
+        self.running = 0
+        self.max_running = 0
+
+    async def generate_stream(self, prompt: str):
+        self.prompts.append(prompt)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            for chunk in self.answers[prompt]:
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                yield chunk
+        finally:
+            self.running -= 1
+
+
+class TurnSTT(ScriptedSTT):
+    """Yields the partials scripted for each fed frame and one final per endpoint."""
+
+    def __init__(self, frame_partials=(), finals=()):
+        super().__init__(partials=[], final={"text": "", "is_final": True})
+        self._frame_partials = list(frame_partials)
+        self._finals = list(finals)
+
+    async def stream_partials(self):
+        index = self.feed_count - 1
+        if 0 <= index < len(self._frame_partials):
+            for partial in self._frame_partials[index]:
+                yield partial
+
+    async def get_final(self):
+        text = self._finals.pop(0) if self._finals else ""
+        return {"text": text, "is_final": True, "maybe_sentence_boundary": True}
+
+
+class CommandVAD(ScriptedVAD):
+    """``b"v"`` is voice, ``b"e"`` is silence that closes the utterance, anything else silence."""
+
+    def __init__(self):
+        super().__init__([])
+        self._endpoint = False
+
+    def is_voice(self, pcm_bytes: bytes) -> bool:
+        self._endpoint = pcm_bytes == b"e"
+        return pcm_bytes == b"v"
+
+    def endpointed(self) -> bool:
+        endpoint, self._endpoint = self._endpoint, False
+        return endpoint
+
+
+class PacedTTS(ScriptedTTS):
+    """Plays every sentence as a few slow chunks and records what it was asked to say."""
+
+    def __init__(self, chunks=3, delay=0.05):
+        super().__init__()
+        self.calls = []
+        self.chunks = chunks
+        self.delay = delay
+        self.playing = asyncio.Event()
+
+    async def stream(self, text: str):
+        self.calls.append(text)
+        self._stop_event.clear()
+        for index in range(self.chunks):
+            if self._stop_event.is_set():
+                break
+            self.playing.set()
+            await asyncio.sleep(self.delay)
+            yield f"{text}#{index}".encode()
+
+
+def _start_session(orchestrator, events, **kwargs):
+    audio_queue: "asyncio.Queue[bytes | None]" = asyncio.Queue()
+
+    async def ws_send_text(payload):
+        events.append(("text", payload))
+
+    async def ws_send_audio(payload):
+        events.append(("binary", payload))
+
+    task = asyncio.create_task(orchestrator.handle_session(audio_queue, ws_send_text, ws_send_audio))
+    return audio_queue, task
+
+
+async def _wait_until(predicate, timeout=1.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < deadline, "condition not reached"
+        await asyncio.sleep(0.005)
+
+
+def _assistant_texts(events):
+    return [
+        payload["text"]
+        for kind, payload in events
+        if kind == "text" and payload.get("type") == "assistant_text"
+    ]
+
+
+def test_pending_prompt_latest_wins():
+    async def runner():
+        stt = ScriptedSTT(
+            partials=[
+                {"text": "hola.", "is_final": False, "maybe_sentence_boundary": True},
+                {"text": "buenos días.", "is_final": False, "maybe_sentence_boundary": True},
+                {"text": "Qué tal?", "is_final": False, "maybe_sentence_boundary": True},
+            ],
+            final={"text": "qué tal", "is_final": True, "maybe_sentence_boundary": True},
+        )
+        llm = RecordingLLM()
+        tts = ScriptedTTS()
+        vad = ScriptedVAD([True, False, False, False], endpoint_after=4)
+        orchestrator = Orchestrator(stt=stt, llm=llm, tts=tts, vad=vad)
+
+        events = []
+        await run_orchestrator(orchestrator, audio_iter([b"c1", b"c2", b"c3", b"c4"]), events)
+
+        # "buenos días." was superseded while "hola." ran; the final only differs
+        # from the last prompt by punctuation/case, so it is not generated again.
+        assert llm.prompts == ["hola.", "Qué tal?"]
+
+    asyncio.run(runner())
+
+
+def test_final_preempts_partial_generation():
+    async def runner():
+        stt = ScriptedSTT(
+            partials=[{"text": "hola", "is_final": False, "maybe_sentence_boundary": True}],
+            final={"text": "hola, ¿cómo estás?", "is_final": True, "maybe_sentence_boundary": True},
+        )
+        llm = PromptLLM(
+            {
+                "hola": ["parcial uno.", " parcial dos."],
+                "hola, ¿cómo estás?": ["final uno.", " final dos."],
+            },
+            delay=0.05,
+        )
+        tts = InspectTTS()
+        vad = ScriptedVAD([True, False], endpoint_after=2)
+        orchestrator = Orchestrator(stt=stt, llm=llm, tts=tts, vad=vad)
+
+        async def frames():
+            for chunk in [b"c1", b"c2"]:
+                await asyncio.sleep(0)
+                yield chunk
+            await asyncio.sleep(0.3)
+
+        events = []
+        await run_orchestrator(orchestrator, frames(), events)
+
+        assert llm.prompts == ["hola", "hola, ¿cómo estás?"]
+        # The partial-triggered answer was cut before any of it was spoken or shown.
+        spoken = "".join(tts.calls) + "".join(_assistant_texts(events))
+        assert "parcial" not in spoken
+        assert tts.calls == ["final uno.", " final dos."]
+        assert "".join(_assistant_texts(events)) == "final uno. final dos."
+
+    asyncio.run(runner())
+
+
+class StalledLLM(PromptLLM):
+    """Never produces a chunk for prompts missing from ``answers``."""
+
+    async def generate_stream(self, prompt: str):
+        if prompt not in self.answers:
+            self.prompts.append(prompt)
+            await asyncio.Event().wait()
+        async for chunk in super().generate_stream(prompt):
+            yield chunk
+
+
+def test_preempting_a_stalled_llm_does_not_block_listening():
+    async def runner():
+        stt = TurnSTT(
+            frame_partials=[[{"text": "hola", "is_final": False, "maybe_sentence_boundary": True}]],
+            finals=["hola, ¿qué tal?"],
+        )
+        llm = StalledLLM({"hola, ¿qué tal?": ["bien."]})
+        tts = PacedTTS(chunks=1, delay=0.0)
+        orchestrator = Orchestrator(stt=stt, llm=llm, tts=tts, vad=CommandVAD())
+
+        events = []
+        audio_queue, task = _start_session(orchestrator, events)
+        audio_queue.put_nowait(b"v")
+        await _wait_until(lambda: llm.prompts == ["hola"])
+        audio_queue.put_nowait(b"e")
+        await _wait_until(lambda: tts.calls == ["bien."])
+        audio_queue.put_nowait(None)
+        await asyncio.wait_for(task, timeout=1.0)
+
+    asyncio.run(runner())
+
+
 class BargeVAD(ScriptedVAD):
     def __init__(self):
         super().__init__([True, False, True, True, False], endpoint_after=5)
@@ -230,3 +469,172 @@ def test_metrics_emitted():
         assert metrics["turn_total_ms"] >= 0
 
     asyncio.run(runner())
+
+
+def test_barge_in_after_llm_finished_then_next_prompt_is_answered():
+    async def runner():
+        stt = TurnSTT(finals=["hola", "adios"])
+        llm = PromptLLM({"hola": ["primera respuesta."], "adios": ["segunda respuesta."]})
+        tts = PacedTTS()
+        orchestrator = Orchestrator(stt=stt, llm=llm, tts=tts, vad=CommandVAD())
+
+        events = []
+        audio_queue, task = _start_session(orchestrator, events)
+        audio_queue.put_nowait(b"v")
+        audio_queue.put_nowait(b"e")
+        # The whole first answer is generated; only its playback is still running.
+        await _wait_until(lambda: tts.playing.is_set() and orchestrator._llm_task.done())
+        assert orchestrator.state == SessionState.SPEAKING
+
+        audio_queue.put_nowait(b"v")  # barge-in during the last queued sentence
+        audio_queue.put_nowait(b"e")
+        await _wait_until(lambda: len(tts.calls) == 2)
+        audio_queue.put_nowait(None)
+        await task
+
+        assert llm.prompts == ["hola", "adios"]
+        assert tts.calls == ["primera respuesta.", "segunda respuesta."]
+        assert "segunda respuesta." in "".join(_assistant_texts(events))
+
+    asyncio.run(runner())
+
+
+def _partial(text):
+    return [{"text": text, "is_final": False, "maybe_sentence_boundary": False}]
+
+
+# Two utterances; each repeats a partial and the second starts like the first.
+PARTIAL_FRAMES = [
+    (b"v", _partial("hola")),
+    (b"v", _partial("hola")),
+    (b"v", _partial("hola que")),
+    (b"v", _partial("hola qué tal")),
+    (b"e", []),
+    (b"v", _partial("hola otra vez")),
+    (b"v", _partial("hola otra vez")),
+    (b"e", []),
+]
+EXPECTED_PARTIALS = ["hola", "hola que", "hola qué tal", "hola otra vez"]
+
+
+async def _run_partial_script(partial_delta):
+    stt = TurnSTT(
+        frame_partials=[partials for _, partials in PARTIAL_FRAMES],
+        finals=["hola qué tal", "hola otra vez"],
+    )
+    orchestrator = Orchestrator(
+        stt=stt,
+        llm=ScriptedLLM(["vale."]),
+        tts=ScriptedTTS(),
+        vad=CommandVAD(),
+        partial_delta=partial_delta,
+    )
+    events = []
+    audio_queue, task = _start_session(orchestrator, events)
+    for frame, _ in PARTIAL_FRAMES:
+        audio_queue.put_nowait(frame)
+    audio_queue.put_nowait(None)
+    await task
+    return [payload for kind, payload in events if kind == "text"]
+
+
+def test_unchanged_partials_are_not_resent():
+    async def runner():
+        messages = await _run_partial_script(partial_delta=False)
+        texts = [m["text"] for m in messages if m.get("type") == "stt_partial"]
+        assert texts == EXPECTED_PARTIALS
+
+    asyncio.run(runner())
+
+
+def test_partial_deltas_rebuild_transcript_and_reset_after_final():
+    async def runner():
+        messages = await _run_partial_script(partial_delta=True)
+        assert not [m for m in messages if m.get("type") == "stt_partial"]
+
+        rebuilt, base_lens, text = [], [], ""
+        for message in messages:
+            if message.get("type") == "stt_final":
+                text = ""  # what voice_client does
+            elif message.get("type") == "stt_partial_delta":
+                assert message["base_len"] <= len(text)
+                text = text[: message["base_len"]] + message["delta"]
+                rebuilt.append(text)
+                base_lens.append(message["base_len"])
+
+        # Repeats are skipped, and the second utterance is not diffed against the first.
+        assert rebuilt == EXPECTED_PARTIALS
+        assert base_lens == [0, len("hola"), len("hola qu"), 0]
+
+    asyncio.run(runner())
+
+
+def test_barge_in_drops_queued_sentences_of_interrupted_generation():
+    async def runner():
+        stt = TurnSTT(finals=["hola", "adios"])
+        llm = PromptLLM(
+            {"hola": ["uno.", " dos.", " tres.", " cuatro."], "adios": ["otra cosa."]}
+        )
+        tts = PacedTTS()
+        orchestrator = Orchestrator(stt=stt, llm=llm, tts=tts, vad=CommandVAD())
+
+        events = []
+        audio_queue, task = _start_session(orchestrator, events)
+        audio_queue.put_nowait(b"v")
+        audio_queue.put_nowait(b"e")
+        # Every sentence of the first answer is queued while "uno." is playing.
+        await _wait_until(lambda: tts.playing.is_set() and orchestrator._llm_task.done())
+        assert orchestrator._speak_q.qsize() == 3
+
+        audio_queue.put_nowait(b"v")  # barge-in
+        barge_at = len(events)
+        audio_queue.put_nowait(b"e")
+        await _wait_until(lambda: "otra cosa." in tts.calls)
+        audio_queue.put_nowait(None)
+        await task
+
+        # The queued " dos.", " tres." and " cuatro." were skipped, never synthesized.
+        assert tts.calls == ["uno.", "otra cosa."]
+        late_audio = [payload for kind, payload in events[barge_at:] if kind == "binary"]
+        stale = (b" dos.", b" tres.", b" cuatro.")
+        assert not [chunk for chunk in late_audio if chunk.startswith(stale)]
+        assert [chunk for chunk in late_audio if chunk.startswith(b"otra cosa.")]
+
+    asyncio.run(runner())
+
+
+def test_barge_in_while_llm_streams_cancels_it_before_next_turn():
+    async def runner():
+        stt = TurnSTT(finals=["hola", "adios"])
+        llm = PromptLLM(
+            {"hola": ["uno.", " dos.", " tres.", " cuatro."], "adios": ["otra.", " cosa."]},
+            delay=0.05,
+        )
+        tts = PacedTTS()
+        orchestrator = Orchestrator(stt=stt, llm=llm, tts=tts, vad=CommandVAD())
+
+        events = []
+        audio_queue, task = _start_session(orchestrator, events)
+        audio_queue.put_nowait(b"v")
+        audio_queue.put_nowait(b"e")
+        await _wait_until(tts.playing.is_set)
+        first_task = orchestrator._llm_task
+        assert not first_task.done()  # the first answer is still streaming
+
+        audio_queue.put_nowait(b"v")  # barge-in
+        audio_queue.put_nowait(b"e")
+        await _wait_until(lambda: llm.prompts == ["hola", "adios"])
+        assert first_task.cancelled()
+        # Long enough for the old stream to have produced another chunk.
+        await asyncio.sleep(0.08)
+        assert orchestrator._active_prompt == "adios"
+        assert orchestrator.state != SessionState.LISTENING
+
+        await _wait_until(lambda: orchestrator._llm_task.done() and " cosa." in tts.calls)
+        audio_queue.put_nowait(None)
+        await task
+
+        assert llm.max_running == 1
+        assert tts.calls == ["uno.", "otra.", " cosa."]
+
+    asyncio.run(runner())
@@ -0,0 +1,90 @@
+import pathlib
+import sys
+
+import numpy as np
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from Services.sanctuary_core.vad import EnergyVAD
+
+# 1 = loud frame, 0 = silent frame; long enough silences to cross the hangover.
+PATTERN = [1, 1, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 1, 1, 0, 0, 0, 0, 0]
+
+
+def _make_vad() -> EnergyVAD:
+    # 60 ms of silence (3 frames of 20 ms) closes an utterance.
+    return EnergyVAD(sample_rate=16000, frame_ms=20, silence_ms=60)
+
+
+def _frames(vad: EnergyVAD, pattern) -> list:
+    rng = np.random.default_rng(0)
+    frames = []
+    for loud in pattern:
+        amplitude = 2000 if loud else 5
+        samples = rng.integers(-amplitude, amplitude + 1, vad.frame_len).astype(np.int16)
+        frames.append(samples.tobytes())
+    return frames
+
+
+def _feed_one_by_one(vad: EnergyVAD, frames):
+    voiced, endpoints = [], []
+    for frame in frames:
+        voiced.append(vad.is_voice(frame))
+        endpoints.append(vad._endpoint)
+    return voiced, endpoints
+
+
+def _state(vad: EnergyVAD):
+    return vad._silence_run, vad._endpoint, list(vad._recent_energy)
+
+
+def test_multi_frame_is_voice_matches_frame_by_frame():
+    single, chunked = _make_vad(), _make_vad()
+    frames = _frames(single, PATTERN)
+    voiced, _ = _feed_one_by_one(single, frames)
+
+    # Feed the same audio as coalesced 4-frame chunks (plus a shorter tail).
+    for start in range(0, len(frames), 4):
+        group = frames[start : start + 4]
+        assert chunked.is_voice(b"".join(group)) == any(voiced[start : start + 4])
+
+    assert _state(chunked) == _state(single)
+    assert chunked.endpointed() == single.endpointed()
+
+
+def test_multi_frame_chunk_ending_in_silence_endpoints_like_single_frames():
+    single, chunked = _make_vad(), _make_vad()
+    frames = _frames(single, [1, 0, 0, 0])
+    _feed_one_by_one(single, frames)
+    chunked.is_voice(b"".join(frames))
+    assert single.endpointed() is True
+    assert chunked.endpointed() is True
+
+
+def test_process_batch_matches_frame_by_frame():
+    single, batched = _make_vad(), _make_vad()
+    frames = _frames(single, PATTERN)
+    voiced, endpoints = _feed_one_by_one(single, frames)
+
+    mask, endpoint_indices = batched.process_batch(b"".join(frames))
+
+    assert mask.tolist() == voiced
+    rising = [
+        i for i, flag in enumerate(endpoints) if flag and (i == 0 or not endpoints[i - 1])
+    ]
+    assert endpoint_indices.tolist() == rising
+    assert _state(batched) == _state(single)
+
+
+def test_process_batch_carries_state_across_calls():
+    single, batched = _make_vad(), _make_vad()
+    frames = _frames(single, PATTERN)
+    voiced, _ = _feed_one_by_one(single, frames)
+
+    first, _ = batched.process_batch(b"".join(frames[:7]))
+    second, _ = batched.process_batch(b"".join(frames[7:]))
+
+    assert first.tolist() + second.tolist() == voiced
+    assert _state(batched) == _state(single)
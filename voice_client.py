@@ -4,11 +4,46 @@ from __future__ import annotations
 import argparse
 import asyncio
 import json
+import queue
 import signal
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Optional
 import sounddevice as sd
 import websockets
 
+try:  # pragma: no cover - optional dependency
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+try:  # pragma: no cover - optional dependency
+    import uvloop
+except ImportError:  # pragma: no cover - optional dependency
+    uvloop = None
+
+
+# Capture frames in flight between the PortAudio thread and the sender (~640 ms at 20 ms).
+_CAPTURE_POOL_SIZE = 32
+# Upper bound of frames coalesced into one websocket message when the sender lags.
+_MAX_FRAMES_PER_SEND = 4
+# TTS chunks buffered for playback; when full the receiver waits (back-pressure).
+_PLAYBACK_QUEUE_SIZE = 64
+
+
+def _dumps(payload) -> str:
+    # Control messages go as text frames; binary frames carry audio only.
+    if orjson is not None:
+        return orjson.dumps(payload).decode()
+    return json.dumps(payload)
+
+
+def _loads(text: str):
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch either.
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
 
 def _build_arg_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Sanctuary realtime voice client")
@@ -32,46 +67,75 @@ async def _playback_loop(queue: "asyncio.Queue[Any]") -> None:
     stream: Optional[sd.RawOutputStream] = None
     current_rate = 16000
     loop = asyncio.get_running_loop()
+    # A dedicated writer keeps chunks in FIFO order and off the shared default pool.
+    audio_exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sd-writer")
 
-    while True:
-        item = await queue.get()
-        if item is None:
-            break
-        if isinstance(item, tuple) and item[0] == "rate":
-            current_rate = int(item[1])
-            if stream is not None:
-                stream.stop()
-                stream.close()
-                stream = None
-            continue
-        audio_bytes = item
-        if stream is None:
-            stream = sd.RawOutputStream(
-                samplerate=current_rate,
-                channels=1,
-                dtype="int16",
-                blocksize=0,
-            )
-            stream.start()
-        await loop.run_in_executor(None, stream.write, audio_bytes)
-
-    if stream is not None:
-        stream.stop()
-        stream.close()
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            if isinstance(item, tuple) and item[0] == "rate":
+                current_rate = int(item[1])
+                if stream is not None:
+                    stream.stop()
+                    stream.close()
+                    stream = None
+                continue
+            audio_bytes = item
+            if stream is None:
+                stream = sd.RawOutputStream(
+                    samplerate=current_rate,
+                    channels=1,
+                    dtype="int16",
+                    blocksize=0,
+                )
+                stream.start()
+            await loop.run_in_executor(audio_exec, stream.write, audio_bytes)
+    finally:
+        audio_exec.shutdown(wait=True)
+        if stream is not None:
+            stream.stop()
+            stream.close()
 
 
 async def run_client(args: argparse.Namespace) -> None:
     sample_rate = args.sample_rate
     frame_samples = int(sample_rate * args.frame_ms / 1000)
-    capture_queue: "asyncio.Queue[bytes]" = asyncio.Queue()
-    playback_queue: "asyncio.Queue[Any]" = asyncio.Queue()
+    capture_queue: "asyncio.Queue[Optional[tuple[Optional[int], Any]]]" = asyncio.Queue()
+    playback_queue: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=_PLAYBACK_QUEUE_SIZE)
     loop = asyncio.get_running_loop()
 
+    # Preallocated frame buffers: the callback copies into a free slot and the
+    # sender hands the slot back once the frame is on the wire, so the realtime
+    # thread does not allocate per frame.
+    frame_bytes = frame_samples * 2
+    slots = [memoryview(bytearray(frame_bytes)) for _ in range(_CAPTURE_POOL_SIZE)]
+    free_slots: "queue.SimpleQueue[int]" = queue.SimpleQueue()
+    for index in range(_CAPTURE_POOL_SIZE):
+        free_slots.put(index)
+
     def _capture_callback(indata, frames, time_info, status):  # pragma: no cover - callback
         if status:
             print("[capture]", status)
-        frame = bytes(indata)
-        loop.call_soon_threadsafe(capture_queue.put_nowait, frame)
+        # sounddevice hands a read-only CFFI buffer; a flat unsigned-byte view
+        # matches the bytearray slots, so both copies below are a single memcpy.
+        data = memoryview(indata).cast("B")
+        size = data.nbytes
+        try:
+            index = free_slots.get_nowait()
+        except queue.Empty:
+            index = None
+        if index is None or size > frame_bytes:
+            if index is not None:
+                free_slots.put(index)
+            # Pool exhausted (sender stalled) or odd-sized block: allocate.
+            item = (None, data.tobytes())
+        else:
+            view = slots[index][:size]
+            view[:] = data
+            item = (index, view)
+        loop.call_soon_threadsafe(capture_queue.put_nowait, item)
 
     input_stream = sd.RawInputStream(
         samplerate=sample_rate,
@@ -85,21 +149,57 @@ async def run_client(args: argparse.Namespace) -> None:
     async with websockets.connect(args.uri, ping_interval=None) as ws:
         async def sender() -> None:
             try:
-                while True:
-                    chunk = await capture_queue.get()
-                    if chunk is None:
+                batch = bytearray(_MAX_FRAMES_PER_SEND * frame_bytes)
+                done = False
+                while not done:
+                    item = await capture_queue.get()
+                    if item is None:
                         break
-                    await ws.send(chunk)
+                    index, chunk = item
+                    if capture_queue.empty():
+                        try:
+                            # websockets copies the payload into the frame before send() returns.
+                            await ws.send(chunk)
+                        finally:
+                            if index is not None:
+                                free_slots.put(index)
+                        continue
+                    # Backlog: coalesce queued frames into one message to save
+                    # framing and syscalls.
+                    size = 0
+                    while True:
+                        batch[size : size + len(chunk)] = chunk
+                        size += len(chunk)
+                        if index is not None:
+                            free_slots.put(index)
+                        if capture_queue.empty() or size + frame_bytes > len(batch):
+                            break
+                        item = capture_queue.get_nowait()
+                        if item is None:
+                            done = True
+                            break
+                        index, chunk = item
+                    await ws.send(memoryview(batch)[:size])
             finally:
                 stop_event.set()
 
         async def receiver() -> None:
+            overruns = 0
+            partial_text = ""
             try:
                 async for message in ws:
                     if isinstance(message, bytes):
+                        if playback_queue.full():
+                            overruns += 1
                         await playback_queue.put(message)
                         continue
-                    event = json.loads(message)
+                    event = _loads(message)
+                    if event.get("type") == "stt_partial_delta":
+                        # Rebuild the full partial from the unchanged prefix plus the new suffix.
+                        partial_text = partial_text[: event["base_len"]] + event["delta"]
+                        event = {"type": "stt_partial", "text": partial_text, "is_final": event["is_final"]}
+                    elif event.get("type") == "stt_final":
+                        partial_text = ""
                     if args.print_events:
                         print("[event]", event)
                     if event.get("type") == "tts_metadata":
@@ -107,6 +207,8 @@ async def run_client(args: argparse.Namespace) -> None:
                     elif event.get("type") == "metrics":
                         print("[metrics]", event)
             finally:
+                if overruns:
+                    print("[metrics]", {"playback_overruns": overruns})
                 stop_event.set()
 
         async def playback() -> None:
@@ -119,11 +221,17 @@ async def run_client(args: argparse.Namespace) -> None:
             input_stream.stop()
             input_stream.close()
             try:
-                await ws.send(json.dumps({"type": "end_user_turn"}))
+                await ws.send(_dumps({"type": "end_user_turn"}))
             except Exception:  # pragma: no cover - connection teardown
                 pass
             await capture_queue.put(None)
-            await playback_queue.put(None)
+            # Pending audio is discarded on shutdown; never block on a full queue.
+            while True:
+                try:
+                    playback_queue.put_nowait(None)
+                    break
+                except asyncio.QueueFull:
+                    playback_queue.get_nowait()
 
         stop_event = asyncio.Event()
 
@@ -151,6 +259,9 @@ async def run_client(args: argparse.Namespace) -> None:
 def main() -> None:
     parser = _build_arg_parser()
     args = parser.parse_args()
+    if uvloop is not None:
+        # libuv loop: cheaper timers and call_soon_threadsafe, used on every captured frame.
+        uvloop.install()
     asyncio.run(run_client(args))
 
 